@@ -0,0 +1,139 @@
+from functools import wraps
+from flask import g, has_request_context, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import and_, select, union
+from models import db, Task, Project, UserRole, project_members
+from cache import TTLCache
+from tokens import user_state
+
+# Роль (пользователь, проект) вычисляется не больше одного раза за запрос (кэш в flask.g).
+# Дополнительно можно включить кэш уровня процесса (ROLE_CACHE_TTL > 0),
+# он сбрасывается при любых изменениях состава участников проекта
+role_cache = TTLCache(maxsize=0, ttl=0, name='project_roles')
+
+_NOT_CACHED = object()
+
+def init_app(app):
+    role_cache.maxsize = app.config.get('ROLE_CACHE_SIZE', 0)
+    role_cache.ttl = app.config.get('ROLE_CACHE_TTL', 0)
+    role_cache.clear()
+
+def _request_roles():
+    if not has_request_context():
+        return {}
+    if '_project_roles' not in g:
+        g._project_roles = {}
+    return g._project_roles
+
+def _effective_role(owner, member_role, user_id):
+    if owner == user_id:
+        return 'Member'
+    return member_role
+
+def remember_role(project_id, user_id, role):
+    _request_roles()[(project_id, user_id)] = role
+    role_cache.set((project_id, user_id), role)
+
+def _cached_role(project_id, user_id):
+    key = (project_id, user_id)
+    roles = _request_roles()
+    if key in roles:
+        return roles[key]
+
+    role = role_cache.get(key, _NOT_CACHED)
+    if role is not _NOT_CACHED:
+        roles[key] = role
+    return role
+
+def accessible_project_ids(user_id):
+    # Проекты пользователя: свои + где он участник (использует индекс project_users.user_id)
+    return union(
+        select(Project.id).where(Project.owner == user_id),
+        select(project_members.c.project_id).where(project_members.c.user_id == user_id)
+    )
+
+def get_current_user_role_in_project(project_id, user_id):
+    role = _cached_role(project_id, user_id)
+    if role is not _NOT_CACHED:
+        return role
+
+    # Владелец и роль участника - одним запросом
+    row = db.session.query(Project.owner, project_members.c.role).outerjoin(
+        project_members,
+        and_(project_members.c.project_id == Project.id, project_members.c.user_id == user_id)
+    ).filter(Project.id == project_id).first()
+
+    role = _effective_role(row[0], row[1], user_id) if row else None
+    remember_role(project_id, user_id, role)
+    return role
+
+def get_roles_in_projects(project_ids, user_id):
+    # Роли сразу в нескольких проектах: не найденные в кэше - одним запросом
+    roles = {}
+    missing = []
+    for project_id in set(project_ids):
+        role = _cached_role(project_id, user_id)
+        if role is _NOT_CACHED:
+            missing.append(project_id)
+        else:
+            roles[project_id] = role
+
+    if missing:
+        rows = db.session.query(Project.id, Project.owner, project_members.c.role).outerjoin(
+            project_members,
+            and_(project_members.c.project_id == Project.id, project_members.c.user_id == user_id)
+        ).filter(Project.id.in_(missing)).all()
+        found = {project_id: _effective_role(owner, member_role, user_id) for project_id, owner, member_role in rows}
+        for project_id in missing:
+            roles[project_id] = found.get(project_id)
+            remember_role(project_id, user_id, roles[project_id])
+
+    return roles
+
+def check_task_access(task_id, user_id):
+    # Задача вместе с ролью в ее проекте - одним запросом
+    row = db.session.query(Task, Project.owner, project_members.c.role).join(
+        Project, Task.project_id == Project.id
+    ).outerjoin(
+        project_members,
+        and_(project_members.c.project_id == Task.project_id, project_members.c.user_id == user_id)
+    ).filter(Task.id == task_id).first()
+
+    if not row:
+        return None, None
+
+    task, owner, member_role = row
+    role = _effective_role(owner, member_role, user_id)
+    remember_role(task.project_id, user_id, role)
+    if role:
+        return task, role
+
+    if any(user.id == user_id for user in task.assignees):
+        return task, 'Assignee'
+
+    return None, None
+
+def invalidate_project_roles(project_id, user_id=None):
+    if user_id is None:
+        role_cache.invalidate_where(lambda key: key[0] == project_id)
+        roles = _request_roles()
+        for key in [k for k in roles if k[0] == project_id]:
+            del roles[key]
+    else:
+        role_cache.invalidate((project_id, user_id))
+        _request_roles().pop((project_id, user_id), None)
+
+def is_admin(user_id):
+    # Роль - из кэша состояния токенов, обновляемого в фоне
+    state = user_state(user_id)
+    return state is not None and state[1] == UserRole.ADMIN.value
+
+def admin_required(view):
+    # Служебные эндпоинты - только для пользователей с ролью admin
+    @wraps(view)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        if not is_admin(int(get_jwt_identity())):
+            return jsonify({"error": "Требуются права администратора"}), 403
+        return view(*args, **kwargs)
+    return wrapper
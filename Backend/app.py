@@ -1,7 +1,19 @@
-from flask import Flask, jsonify
+from flask import Flask
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from models import db
+import access
+import database
+import replicas
+import conditional
+import events
+import serializers
+import delivery
+import db_stats
+import passwords
+import tokens
+import reference
+import deadlines
 from config import Config
 from routes.auth import auth_bp
 from routes.users import users_bp
@@ -10,30 +22,43 @@ from routes.tasks import tasks_bp
 from routes.comments import comments_bp
 from routes.system import system_bp
 
-app = Flask(__name__)
-app.config.from_object(Config)
-CORS(app, resources={r"/api/*": {"origins": "*"}})
+jwt = JWTManager()
 
-db.init_app(app)
-jwt = JWTManager(app)
+def create_app(config_class=Config):
+    # Встроенный маршрут /static отключен: сборка фронтенда отдается через delivery
+    app = Flask(__name__, static_folder=None)
+    app.config.from_object(config_class)
+    serializers.init_app(app)
+    CORS(app, resources={r"/api/*": {"origins": "*"}}, expose_headers=["X-Next-Cursor"])
 
-app.register_blueprint(auth_bp, url_prefix='/api')
-app.register_blueprint(users_bp, url_prefix='/api/users')
-app.register_blueprint(projects_bp, url_prefix='/api/projects')
-app.register_blueprint(tasks_bp, url_prefix='/api/tasks')
-app.register_blueprint(comments_bp, url_prefix='/api')
-app.register_blueprint(system_bp, url_prefix='/api')
+    db.init_app(app)
+    database.init_app(app)
+    replicas.init_app(app)
+    access.init_app(app)
+    conditional.init_app(app)
+    events.init_app(app)
+    delivery.init_app(app)
+    db_stats.init_app(app)
+    reference.init_app(app)
+    deadlines.init_app(app)
+    passwords.init_app(app)
+    jwt.init_app(app)
+    tokens.init_app(app, jwt)
 
-from flask import send_from_directory
-import os
+    app.register_blueprint(auth_bp, url_prefix='/api')
+    app.register_blueprint(users_bp, url_prefix='/api/users')
+    app.register_blueprint(projects_bp, url_prefix='/api/projects')
+    app.register_blueprint(tasks_bp, url_prefix='/api/tasks')
+    app.register_blueprint(comments_bp, url_prefix='/api')
+    app.register_blueprint(system_bp, url_prefix='/api')
 
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve_frontend(path):
-    if path and os.path.exists(os.path.join(app.static_folder, path)):
-        return send_from_directory(app.static_folder, path)
-    return send_from_directory(app.static_folder, 'index.html')
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve_frontend(path):
+        return delivery.send_static(path)
+
+    return app
 
 if __name__ == '__main__':
-    # В production используем gunicorn, но для теста оставим так
-    app.run(host='0.0.0.0', port=5000, debug=False)
+    # Сервер разработки; в production приложение запускается через gunicorn (wsgi.py)
+    create_app().run(host='0.0.0.0', port=5000, debug=False)
@@ -0,0 +1,47 @@
+from sqlalchemy import select, bindparam
+from models import db, User, task_assigneess
+
+def sync_assignees(assignments):
+    # assignments: {task_id: [user_id, ...]} - итоговый состав исполнителей каждой задачи.
+    # Несуществующие пользователи пропускаются. Пишутся только отличия от текущего состава:
+    # один IN-запрос на пользователей, один на текущие связи, затем пакетные INSERT и DELETE
+    if not assignments:
+        return
+
+    requested_ids = {user_id for user_ids in assignments.values() for user_id in user_ids}
+    existing_users = set()
+    if requested_ids:
+        existing_users = set(db.session.scalars(
+            select(User.id).where(User.id.in_(requested_ids))
+        ))
+
+    current = {task_id: set() for task_id in assignments}
+    rows = db.session.execute(
+        select(task_assigneess.c.task_id, task_assigneess.c.user_id)
+        .where(task_assigneess.c.task_id.in_(list(assignments)))
+    )
+    for task_id, user_id in rows:
+        current[task_id].add(user_id)
+
+    to_insert = []
+    to_delete = []
+    for task_id, user_ids in assignments.items():
+        wanted = set(user_ids) & existing_users
+        to_insert += [{'task_id': task_id, 'user_id': u} for u in wanted - current[task_id]]
+        to_delete += [{'t_id': task_id, 'u_id': u} for u in current[task_id] - wanted]
+
+    if to_insert:
+        db.session.execute(task_assigneess.insert(), to_insert)
+    if to_delete:
+        db.session.execute(
+            task_assigneess.delete().where(
+                task_assigneess.c.task_id == bindparam('t_id'),
+                task_assigneess.c.user_id == bindparam('u_id')
+            ),
+            to_delete
+        )
+
+def set_task_assignees(task, user_ids):
+    sync_assignees({task.id: user_ids})
+    # Связи записаны мимо ORM - загруженная коллекция больше не актуальна
+    db.session.expire(task, ['assignees'])
@@ -0,0 +1,258 @@
+# Бенчмарк горячих эндпоинтов API на сгенерированных базах нескольких размеров.
+# Для каждого запроса считается число SQL-запросов (рост с размером базы - признак N+1),
+# для каждого эндпоинта - p50/p95/p99 и пропускная способность. Результат пишется в JSON,
+# два таких файла можно сравнить:
+#   python benchmarks/api.py --sizes 1000,10000,100000 --output results.json
+#   python benchmarks/api.py --sizes 1000,10000 --compare results.json
+# Приложение работает в том же процессе (Flask test client), сеть и сервер не участвуют -
+# см. serving.py для сравнения режимов запуска
+import argparse
+import json
+import math
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+PASSWORD = 'password123'
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='1000,10000', help='число задач в базах, через запятую')
+    parser.add_argument('--requests', type=int, default=200, help='запросов на эндпоинт')
+    parser.add_argument('--login-requests', type=int, default=20, help='запросов на вход (хэширование пароля)')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--only', help='только эндпоинты, в имени которых есть эта строка')
+    parser.add_argument('--output', help='файл для результатов (JSON)')
+    parser.add_argument('--compare', help='результаты предыдущего запуска для сравнения')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='допустимый рост p95 при сравнении')
+    return parser.parse_args()
+
+class QueryCounter:
+    # Число SQL-запросов, выполненных текущим потоком
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self._local = threading.local()
+        event.listen(engine, 'before_cursor_execute', self._count)
+
+    def _count(self, *args):
+        self._local.count = getattr(self._local, 'count', 0) + 1
+
+    def reset(self):
+        self._local.count = 0
+
+    @property
+    def count(self):
+        return getattr(self._local, 'count', 0)
+
+def dataset(tasks):
+    return {
+        'users': max(50, tasks // 100),
+        'projects': max(5, tasks // 1000),
+        'tasks': tasks,
+        'comments': tasks * 2,
+    }
+
+def seed(app, size, args):
+    from models import db
+    from datagen import Generator
+    from migrations import upgrade
+
+    counts = dataset(size)
+    with app.app_context():
+        db.create_all()
+        generator = Generator(counts['users'], counts['projects'], counts['tasks'], counts['comments'],
+                              seed=args.seed, password=PASSWORD)
+        with db.engine.begin() as connection:
+            generator.load(connection)
+        db.session.remove()
+        upgrade(db.engine)
+    return counts
+
+def fixtures(app):
+    # Владелец первого проекта (роль Member), его задача с наибольшим числом комментариев,
+    # участник для фильтра по исполнителю и курсор второй страницы
+    from sqlalchemy import func, select
+    from models import db, User, Project, Task, Comment, task_assigneess
+
+    with app.app_context():
+        project_id, owner = db.session.execute(select(Project.id, Project.owner).order_by(Project.id)).first()
+        email = db.session.scalar(select(User.email).where(User.id == owner))
+        task_id = db.session.scalar(
+            select(Comment.task_id).join(Task, Task.id == Comment.task_id).where(Task.project_id == project_id)
+            .group_by(Comment.task_id).order_by(func.count().desc()).limit(1)
+        ) or db.session.scalar(select(Task.id).where(Task.project_id == project_id).limit(1))
+        assignee_id = db.session.scalar(
+            select(task_assigneess.c.user_id).join(Task, Task.id == task_assigneess.c.task_id)
+            .where(Task.project_id == project_id).limit(1)
+        ) or owner
+
+    client = app.test_client()
+    token = client.post('/api/login', json={'email': email, 'password': PASSWORD}).get_json()['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    cursor = client.get(f'/api/tasks?project_id={project_id}&limit=50', headers=headers).get_json()['next_cursor']
+    return {'email': email, 'headers': headers, 'project_id': project_id, 'task_id': task_id,
+            'assignee_id': assignee_id, 'cursor': cursor}
+
+def targets(f, args):
+    # name -> (метод, путь, json-тело или фабрика тела, число запросов)
+    p, t, n = f['project_id'], f['task_id'], args.requests
+    tasks = f'/api/tasks?project_id={p}'
+    result = {
+        'POST /login': ('POST', '/api/login', {'email': f['email'], 'password': PASSWORD}, args.login_requests),
+        'GET /tasks project': ('GET', tasks, None, n),
+        'GET /tasks priority': ('GET', f'{tasks}&priority=High', None, n),
+        'GET /tasks category': ('GET', f'{tasks}&category=Bug', None, n),
+        'GET /tasks status': ('GET', f'{tasks}&status=Done', None, n),
+        'GET /tasks assignee': ('GET', f'{tasks}&assignee_id={f["assignee_id"]}', None, n),
+        'GET /tasks search': ('GET', f'{tasks}&search=Задача 1', None, n),
+        'GET /tasks page': ('GET', f'{tasks}&limit=50', None, n),
+        'GET /tasks next page': ('GET', f'{tasks}&limit=50&cursor={f["cursor"]}', None, n),
+        'GET /tasks comment_count': ('GET', f'{tasks}&limit=50&include=comment_count', None, n),
+        'GET /tasks ndjson': ('GET', f'{tasks}&format=ndjson&limit=500', None, n),
+        'GET /tasks accessible': ('GET', '/api/tasks?limit=50', None, n),
+        'GET /projects/<id>/members': ('GET', f'/api/projects/{p}/members', None, n),
+        'GET /projects/<id>/members page': ('GET', f'/api/projects/{p}/members?limit=20', None, n),
+        'GET /users search': ('GET', '/api/users?q=user1&limit=20&fields=id,username', None, n),
+        'GET /users project': ('GET', f'/api/users?project_id={p}&limit=50', None, n),
+        'GET /tasks/<id>/comments': ('GET', f'/api/tasks/{t}/comments', None, n),
+        'GET /tasks/<id>/comments page': ('GET', f'/api/tasks/{t}/comments?limit=20', None, n),
+        'POST /tasks': ('POST', '/api/tasks', lambda i: {'title': f'bench {i}', 'project_id': p}, n),
+        'PUT /tasks/<id>': ('PUT', f'/api/tasks/{t}', lambda i: {'title': f'bench update {i}'}, n),
+    }
+    if args.only:
+        result = {name: target for name, target in result.items() if args.only in name}
+    return result
+
+def percentile(values, q):
+    # Ближайший ранг по отсортированному списку
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+def run(app, counter, method, path, body, requests, headers, concurrency):
+    per_client = max(1, requests // concurrency)
+
+    def client(worker):
+        test_client = app.test_client()
+        latencies, queries, errors = [], [], 0
+        for i in range(per_client):
+            payload = body(worker * per_client + i) if callable(body) else body
+            counter.reset()
+            started = time.perf_counter()
+            response = test_client.open(path, method=method, json=payload, headers=headers)
+            response.get_data()
+            latencies.append(time.perf_counter() - started)
+            queries.append(counter.count)
+            if response.status_code >= 400:
+                errors += 1
+        return latencies, queries, errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(client, range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(l for r in results for l in r[0])
+    queries = [q for r in results for q in r[1]]
+    return {
+        'requests': len(latencies),
+        'errors': sum(r[2] for r in results),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'queries_min': min(queries),
+        'queries_max': max(queries),
+    }
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(report, baseline, tolerance):
+    # Регрессия - больше SQL-запросов на запрос или p95 хуже более чем на tolerance
+    previous = {(r['size'], r['endpoint']): r for r in baseline['results']}
+    regressions = []
+    for result in report['results']:
+        old = previous.get((result['size'], result['endpoint']))
+        if not old:
+            continue
+        notes = []
+        if result['queries_max'] > old['queries_max']:
+            notes.append(f"SQL {old['queries_max']} -> {result['queries_max']}")
+        if result['p95_ms'] > old['p95_ms'] * (1 + tolerance):
+            notes.append(f"p95 {old['p95_ms']} -> {result['p95_ms']} ms")
+        if notes:
+            regressions.append(f"{result['size']:>8}  {result['endpoint']:<34} " + ', '.join(notes))
+    return regressions
+
+def main():
+    args = parse_args()
+    from app import create_app
+    from config import Config
+    from database import engine_options
+    from models import db
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'cpus': os.cpu_count(),
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'seed': args.seed,
+        },
+        'results': [],
+    }
+
+    for size in [int(s) for s in args.sizes.split(',')]:
+        path = tempfile.mktemp(suffix='.db')
+
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+            SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+            SQLALCHEMY_REPLICA_URIS = []
+
+        app = create_app(BenchConfig)
+        counts = seed(app, size, args)
+        with app.app_context():
+            counter = QueryCounter(db.engine)
+        f = fixtures(app)
+        print(f"\n=== {size} задач ({', '.join(f'{k}={v}' for k, v in counts.items())}) ===")
+        for name, (method, url, body, requests) in targets(f, args).items():
+            result = run(app, counter, method, url, body, requests, f['headers'], args.concurrency)
+            report['results'].append(dict(size=size, endpoint=name, **result))
+            print(f'{name:<34} ' + '  '.join(f'{k}={v}' for k, v in result.items()))
+        with app.app_context():
+            db.engine.dispose()
+        os.remove(path)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        print('\nРегрессии:' if regressions else '\nРегрессий нет')
+        for line in regressions:
+            print(line)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
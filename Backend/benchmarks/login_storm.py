@@ -0,0 +1,110 @@
+# Шторм входов: пропускная способность /api/login и задержка остальных эндпоинтов, пока
+# идет шторм. Сравниваются хэширование в потоке запроса без ограничений и пул процессов с очередью.
+# Запуск из каталога Backend: python benchmarks/login_storm.py --storm 32 --duration 10
+import argparse
+import http.client
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from serving import seed, start_server
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tasks', type=int, default=2000)
+    parser.add_argument('--storm', type=int, default=32, help='одновременных клиентов входа')
+    parser.add_argument('--probes', type=int, default=4, help='клиентов остальных эндпоинтов')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=2, help='воркеров gunicorn')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--hash-workers', type=int, default=1, help='процессов хэширования на воркер')
+    parser.add_argument('--hash-queue', type=int, default=2)
+    parser.add_argument('--port', type=int, default=5902)
+    return parser.parse_args()
+
+def percentiles(latencies):
+    if not latencies:
+        return {}
+    latencies = sorted(latencies)
+    pick = lambda q: round(latencies[min(len(latencies) - 1, int(q / 100 * len(latencies)))] * 1000, 2)
+    return {'p50_ms': pick(50), 'p95_ms': pick(95), 'p99_ms': pick(99)}
+
+def loop(port, method, path, body, headers, stop):
+    # Запросы подряд до stop; (задержки успешных, число 503, число прочих ошибок)
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    latencies, rejected, errors = [], 0, 0
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except OSError:
+            errors += 1
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            continue
+        if response.status == 503:
+            rejected += 1
+        elif response.status >= 400:
+            errors += 1
+        else:
+            latencies.append(time.perf_counter() - started)
+    return latencies, rejected, errors
+
+def run(args, token, project_id, storm):
+    stop = threading.Event()
+    login = json.dumps({'email': 'bench@example.com', 'password': 'password123'})
+    json_headers = {'Content-Type': 'application/json'}
+    probe = f'/api/tasks?project_id={project_id}&limit=100'
+    with ThreadPoolExecutor(storm + args.probes) as pool:
+        logins = [pool.submit(loop, args.port, 'POST', '/api/login', login, json_headers, stop) for _ in range(storm)]
+        probes = [pool.submit(loop, args.port, 'GET', probe, None, {'Authorization': f'Bearer {token}'}, stop)
+                  for _ in range(args.probes)]
+        time.sleep(args.duration)
+        stop.set()
+        logins, probes = [f.result() for f in logins], [f.result() for f in probes]
+
+    result = {}
+    for name, results in [('login', logins), ('tasks page', probes)]:
+        latencies = [l for r in results for l in r[0]]
+        result[name] = {
+            'ok': len(latencies),
+            'rejected': sum(r[1] for r in results),
+            'errors': sum(r[2] for r in results),
+            'rps': round(len(latencies) / args.duration, 1),
+            **percentiles(latencies),
+        }
+    return result
+
+def main():
+    args = parse_args()
+    path = tempfile.mktemp(suffix='.db')
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{path}')
+    os.environ['DATABASE_URL'] = env['DATABASE_URL']
+    token, project_id = seed(args)
+
+    report = {}
+    # inline - прежнее поведение: хэш в потоке запроса без ограничения числа одновременных входов
+    modes = {'inline': (0, 10 ** 6), 'pool': (args.hash_workers, args.hash_queue)}
+    for mode, (hash_workers, hash_queue) in modes.items():
+        process = start_server('gunicorn', args, dict(env, PASSWORD_HASH_WORKERS=str(hash_workers),
+                                                          PASSWORD_HASH_QUEUE=str(hash_queue)))
+        try:
+            report[f'{mode} / без шторма'] = run(args, token, project_id, storm=0)
+            report[f'{mode} / шторм'] = run(args, token, project_id, storm=args.storm)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    for name, result in report.items():
+        for endpoint, stats in result.items():
+            if stats['ok'] or stats['rejected'] or stats['errors']:
+                print(f'{name:<20} {endpoint:<12} ' + '  '.join(f'{k}={v}' for k, v in stats.items()))
+    print(json.dumps(report, ensure_ascii=False))
+    os.remove(path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+# Планы запросов и время горячих выборок до и после миграции индексов.
+# Запуск из каталога Backend: python benchmarks/query_plans.py --tasks 200000
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--projects', type=int, default=200)
+    parser.add_argument('--tasks', type=int, default=100000)
+    parser.add_argument('--comments', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=20)
+    return parser.parse_args()
+
+def seed(args):
+    from models import db, User, Project, Task, Comment, project_members, task_assigneess
+    from models import TaskStatus, TaskPriority, TaskCategory
+
+    rnd = random.Random(42)
+    start = datetime(2025, 1, 1)
+    db.session.execute(db.insert(User), [
+        {'id': i, 'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': 'x', 'role': 'client'}
+        for i in range(1, args.users + 1)
+    ])
+    db.session.execute(db.insert(Project), [
+        {'id': i, 'name': f'project{i}', 'owner': rnd.randint(1, args.users), 'creation_date': start}
+        for i in range(1, args.projects + 1)
+    ])
+    members = {(rnd.randint(1, args.projects), rnd.randint(1, args.users)) for _ in range(args.projects * 20)}
+    db.session.execute(project_members.insert(), [
+        {'project_id': p, 'user_id': u, 'role': 'Member'} for p, u in members
+    ])
+    db.session.execute(db.insert(Task), [
+        {'id': i, 'title': f'task {i}', 'description': f'description {i}',
+         'status': rnd.choice(list(TaskStatus)).value,
+         'priority': rnd.choice(list(TaskPriority)).value,
+         'category': rnd.choice(list(TaskCategory)).value,
+         'project_id': rnd.randint(1, args.projects),
+         'parent_id': rnd.randint(1, i - 1) if i > 1 and rnd.random() < 0.3 else None,
+         'creation_date': start + timedelta(seconds=i * 60),
+         'deadline_date': start + timedelta(days=rnd.randint(0, 720))}
+        for i in range(1, args.tasks + 1)
+    ])
+    assignees = {(rnd.randint(1, args.tasks), rnd.randint(1, args.users)) for _ in range(args.tasks)}
+    db.session.execute(task_assigneess.insert(), [{'task_id': t, 'user_id': u} for t, u in assignees])
+    db.session.execute(db.insert(Comment), [
+        {'text_comment': f'comment {i}', 'task_id': rnd.randint(1, args.tasks),
+         'author_id': rnd.randint(1, args.users), 'creation_date': start + timedelta(seconds=i)}
+        for i in range(1, args.comments + 1)
+    ])
+    db.session.commit()
+
+def hot_queries():
+    from models import Task, Project, Comment, task_assigneess
+    from sqlalchemy import select
+    from access import accessible_project_ids
+    from search import task_match_ids
+
+    user_id, project_id, task_id = 1, 1, 1
+    accessible = Task.query.filter(Task.project_id.in_(accessible_project_ids(user_id)))
+    keyset = [Task.creation_date, Task.id]
+    return {
+        'tasks: project': accessible.filter(Task.project_id == project_id).order_by(*keyset).limit(100),
+        'tasks: project + status': accessible.filter(Task.project_id == project_id, Task.status == 'Done').order_by(*keyset).limit(100),
+        'tasks: project + priority': accessible.filter(Task.project_id == project_id, Task.priority == 'High').order_by(*keyset).limit(100),
+        'tasks: project + category': accessible.filter(Task.project_id == project_id, Task.category == 'Bug').order_by(*keyset).limit(100),
+        'tasks: assignee': accessible.filter(Task.id.in_(
+            select(task_assigneess.c.task_id).where(task_assigneess.c.user_id == user_id)
+        )).order_by(*keyset).limit(100),
+        'tasks: accessible': accessible.order_by(*keyset).limit(100),
+        'tasks: search': accessible.filter(Task.id.in_(task_match_ids('task 12'))).order_by(*keyset).limit(100),
+        'tasks: subtasks': Task.query.filter(Task.parent_id == task_id),
+        'tasks: deadline range': Task.query.filter(Task.deadline_date.between(datetime(2025, 3, 1), datetime(2025, 3, 8))),
+        'comments: task': Comment.query.filter_by(task_id=task_id).order_by(Comment.creation_date.desc()),
+        'projects: user': Project.query.filter(Project.id.in_(accessible_project_ids(user_id))),
+    }
+
+def measure(label, repeat):
+    from models import db
+
+    print(f'\n=== {label} ===')
+    for name, query in hot_queries().items():
+        statement = query.statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+        plan = db.session.execute(db.text(f'EXPLAIN QUERY PLAN {statement}')).fetchall()
+        started = time.perf_counter()
+        for _ in range(repeat):
+            db.session.execute(query.statement).fetchall()
+        elapsed = (time.perf_counter() - started) / repeat * 1000
+        print(f'{name:<28} {elapsed:9.2f} ms')
+        for row in plan:
+            print(f'    {row[-1]}')
+
+def main():
+    args = parse_args()
+    path = tempfile.mktemp(suffix='.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+
+    from app import create_app
+    from models import db
+    from migrations import upgrade
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        # Схема до миграции: только первичные ключи и unique-ограничения
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.drop(db.engine)
+        seed(args)
+        measure('до миграции', args.repeat)
+        db.session.remove()
+        created = upgrade(db.engine)
+        db.session.remove()
+        print(f'\nСоздано индексов: {len(created)}')
+        measure('после миграции', args.repeat)
+
+    os.remove(path)
+
+if __name__ == '__main__':
+    main()
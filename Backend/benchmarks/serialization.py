@@ -0,0 +1,95 @@
+# Время выдачи списка задач: ORM + marshmallow + стандартный json против
+# Core select() + сгенерированного сериализатора + FastJSONProvider.
+# Запуск из каталога Backend: python benchmarks/serialization.py --tasks 10000
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tasks', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=10)
+    return parser.parse_args()
+
+def seed(args):
+    from models import db, User, Project, Task
+
+    start = datetime(2025, 1, 1)
+    db.session.execute(db.insert(User), [
+        {'id': 1, 'username': 'user1', 'email': 'user1@example.com', 'password_hash': 'x', 'role': 'client'}
+    ])
+    db.session.execute(db.insert(Project), [{'id': 1, 'name': 'project1', 'owner': 1, 'creation_date': start}])
+    db.session.execute(db.insert(Task), [
+        {'id': i, 'title': f'task {i}', 'description': f'description {i}', 'status': 'ToDo',
+         'priority': 'High', 'category': 'Bug', 'project_id': 1,
+         'creation_date': start + timedelta(seconds=i), 'deadline_date': start + timedelta(days=i % 365)}
+        for i in range(1, args.tasks + 1)
+    ])
+    db.session.commit()
+
+def stages(app):
+    from models import db, Task
+    from schemas import tasks_schema
+    from serializers import task_rows
+
+    stdlib_json = json.JSONEncoder(ensure_ascii=True, sort_keys=True, separators=(',', ':'))
+
+    def orm_load():
+        db.session.expunge_all()
+        return Task.query.order_by(Task.id).all()
+
+    def core_load():
+        return db.session.execute(task_rows.select().order_by(Task.id)).all()
+
+    tasks = orm_load()
+    rows = core_load()
+    data = tasks_schema.dump(tasks)
+    return {
+        'загрузка: ORM-объекты': orm_load,
+        'загрузка: Core select()': core_load,
+        'dict: marshmallow dump': lambda: tasks_schema.dump(tasks),
+        'dict: RowSerializer': lambda: task_rows.dump_many(rows),
+        'json: стандартный провайдер': lambda: stdlib_json.encode(data),
+        'json: FastJSONProvider': lambda: app.json.response(data),
+        'итого: было': lambda: stdlib_json.encode(tasks_schema.dump(orm_load())),
+        'итого: стало': lambda: app.json.response(task_rows.dump_many(core_load())),
+    }
+
+def measure(app, args):
+    from serializers import orjson
+
+    per = 10000 / args.tasks
+    print(f'Задач: {args.tasks}, orjson: {"да" if orjson else "нет"}; время в пересчете на 10k задач')
+    for name, stage in stages(app).items():
+        stage()
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            stage()
+        elapsed = (time.perf_counter() - started) / args.repeat * 1000 * per
+        print(f'{name:<30} {elapsed:9.2f} ms')
+
+def main():
+    args = parse_args()
+    path = tempfile.mktemp(suffix='.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+
+    from app import create_app
+    from models import db
+
+    app = create_app()
+    with app.test_request_context():
+        db.create_all()
+        seed(args)
+        measure(app, args)
+        db.session.remove()
+
+    os.remove(path)
+
+if __name__ == '__main__':
+    main()
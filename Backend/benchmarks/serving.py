@@ -0,0 +1,136 @@
+# Нагрузочное сравнение режимов запуска: сервер разработки Flask (python app.py) и gunicorn.
+# Запуск из каталога Backend: python benchmarks/serving.py --concurrency 32 --requests 4000
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tasks', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=4000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--port', type=int, default=5901)
+    return parser.parse_args()
+
+def seed(args):
+    from app import create_app
+    from models import db, User, Project, Task
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.com', role='client')
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.flush()
+        project = Project(name='bench', owner=user.id)
+        db.session.add(project)
+        db.session.flush()
+        start = datetime(2025, 1, 1)
+        db.session.execute(db.insert(Task), [
+            {'title': f'task {i}', 'project_id': project.id, 'creation_date': start + timedelta(minutes=i)}
+            for i in range(args.tasks)
+        ])
+        db.session.commit()
+        response = app.test_client().post('/api/login', json={'email': 'bench@example.com', 'password': 'password123'})
+        return response.get_json()['access_token'], project.id
+
+def start_server(mode, args, env):
+    if mode == 'flask-dev':
+        command = [sys.executable, '-c',
+                   f"from app import create_app; create_app().run(host='127.0.0.1', port={args.port})"]
+    else:
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app']
+        env = dict(env, GUNICORN_BIND=f'127.0.0.1:{args.port}', GUNICORN_WORKERS=str(args.workers),
+                   GUNICORN_THREADS=str(args.threads), GUNICORN_ACCESS_LOG='/dev/null',
+                   GUNICORN_LOG_LEVEL='warning')
+    process = subprocess.Popen(command, cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', args.port, timeout=1)
+            connection.request('GET', '/api/health')
+            if connection.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'{mode}: сервер не запустился')
+
+def run_load(args, path, headers):
+    per_client = args.requests // args.concurrency
+
+    def client(_):
+        connection = http.client.HTTPConnection('127.0.0.1', args.port, timeout=30)
+        latencies, errors = [], 0
+        for _ in range(per_client):
+            started = time.perf_counter()
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                if response.status != 200:
+                    errors += 1
+            except OSError:
+                errors += 1
+                connection = http.client.HTTPConnection('127.0.0.1', args.port, timeout=30)
+            latencies.append(time.perf_counter() - started)
+        return latencies, errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        results = list(pool.map(client, range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(l for result in results for l in result[0])
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        'requests': len(latencies),
+        'errors': sum(result[1] for result in results),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(quantiles[49] * 1000, 2),
+        'p95_ms': round(quantiles[94] * 1000, 2),
+        'p99_ms': round(quantiles[98] * 1000, 2),
+    }
+
+def main():
+    args = parse_args()
+    path = tempfile.mktemp(suffix='.db')
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{path}')
+    os.environ['DATABASE_URL'] = env['DATABASE_URL']
+    token, project_id = seed(args)
+
+    targets = {
+        'health': ('/api/health', {}),
+        'tasks page': (f'/api/tasks?project_id={project_id}&limit=100', {'Authorization': f'Bearer {token}'}),
+    }
+    report = {}
+    for mode in ['flask-dev', 'gunicorn']:
+        process = start_server(mode, args, env)
+        try:
+            for name, (url, headers) in targets.items():
+                report[f'{mode} / {name}'] = run_load(args, url, headers)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    for name, result in report.items():
+        print(f'{name:<28} ' + '  '.join(f'{k}={v}' for k, v in result.items()))
+    print(json.dumps(report))
+    os.remove(path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+# Именованные кэши процесса - для статистики попаданий (/api/cache-stats)
+caches = {}
+
+class TTLCache:
+    # Ограниченный по размеру LRU-кэш со временем жизни записей.
+    # Живет в памяти одного процесса: другие воркеры видят изменения только по истечении ttl
+    def __init__(self, maxsize=1024, ttl=60, name=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        if name:
+            caches[name] = self
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0 and self.ttl > 0
+
+    def get(self, key, default=None):
+        if not self.enabled:
+            return default
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                self.misses += 1
+                return default
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def replace(self, key, value):
+        # Новое значение для существующей записи без продления срока жизни
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                self._data[key] = (item[0], value)
+
+    def keys(self):
+        with self._lock:
+            return list(self._data)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate_where(self, predicate):
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        requests = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / requests, 4) if requests else None,
+        }
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,91 @@
+import hashlib
+import secrets
+from flask import g, request, Response
+from sqlalchemy import event, select, update, insert, func, bindparam, Select, CompoundSelect
+from models import db, ResourceVersion
+
+# Условные GET-запросы. Каждая запись увеличивает версию своей области (проекта)
+# в той же транзакции, что и сама запись. Чтение сначала сверяет ETag клиента
+# с версиями - запросы по первичному ключу - и при совпадении отвечает 304,
+# не выполняя основной запрос и сериализацию.
+# Пересоздание таблиц (init-db, datagen --reset) сбрасывает версии к начальным значениям,
+# поэтому в ETag входит и эпоха базы - случайное число, которое записывается при создании таблицы версий.
+# ETag слабый (W/): он описывает данные, а не байты ответа - сжатый и несжатый ответ
+# (delivery.py) имеют один и тот же слабый ETag
+
+PROJECT = 'project'
+EPOCH = 'epoch'
+
+@event.listens_for(ResourceVersion.__table__, 'after_create')
+def _write_epoch(table, connection, **kw):
+    connection.execute(insert(table).values(scope=EPOCH, object_id=0, version=secrets.randbits(31)))
+
+def init_app(app):
+    app.after_request(_set_etag)
+
+def _set_etag(response):
+    etag = g.pop('etag', None)
+    if etag and response.status_code == 200:
+        response.set_etag(etag, weak=True)
+    return response
+
+def _upsert_statement(dialect):
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    else:
+        return None
+    stmt = upsert(ResourceVersion).values(scope=bindparam('scope'), object_id=bindparam('object_id'), version=1)
+    return stmt.on_conflict_do_update(
+        index_elements=['scope', 'object_id'],
+        set_={'version': ResourceVersion.version + 1}
+    )
+
+def touch(scope, *object_ids):
+    # Вызывается до commit: версия меняется атомарно вместе с данными
+    ids = sorted({i for i in object_ids if i is not None})
+    stmt = _upsert_statement(db.session.get_bind().dialect.name)
+    for object_id in ids:
+        if stmt is not None:
+            db.session.execute(stmt, {'scope': scope, 'object_id': object_id})
+            continue
+        result = db.session.execute(
+            update(ResourceVersion)
+            .where(ResourceVersion.scope == scope, ResourceVersion.object_id == object_id)
+            .values(version=ResourceVersion.version + 1)
+        )
+        if result.rowcount == 0:
+            db.session.execute(insert(ResourceVersion).values(scope=scope, object_id=object_id, version=1))
+
+def versions(scope, object_ids):
+    # object_ids - список id или select, возвращающий id; отсутствующая версия считается нулевой
+    if isinstance(object_ids, (Select, CompoundSelect)):
+        ids = object_ids.subquery()
+        stmt = select(ids.c[0], func.coalesce(ResourceVersion.version, 0)).outerjoin(
+            ResourceVersion,
+            (ResourceVersion.scope == scope) & (ResourceVersion.object_id == ids.c[0])
+        )
+        return sorted(tuple(row) for row in db.session.execute(stmt))
+
+    ids = list(object_ids)
+    found = dict(db.session.execute(
+        select(ResourceVersion.object_id, ResourceVersion.version)
+        .where(ResourceVersion.scope == scope, ResourceVersion.object_id.in_(ids))
+    ).all())
+    return sorted((object_id, found.get(object_id, 0)) for object_id in ids)
+
+def not_modified(scope, object_ids, user_id=None):
+    # Возвращает готовый ответ 304 или None; ETag запоминается и ставится на ответ 200
+    epoch = db.session.scalar(
+        select(ResourceVersion.version).where(ResourceVersion.scope == EPOCH, ResourceVersion.object_id == 0)
+    )
+    state = repr((request.full_path, user_id, epoch, scope, versions(scope, object_ids)))
+    etag = hashlib.sha1(state.encode()).hexdigest()
+    g.etag = etag
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        g.pop('etag', None)
+        return response
+    return None
@@ -0,0 +1,78 @@
+import os
+from flask import current_app, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# Настройки движка БД. Для SQLite при каждом подключении включаются WAL, synchronous=NORMAL,
+# mmap, увеличенный кэш страниц и busy_timeout. Транзакции запросов, меняющих данные, начинаются
+# с BEGIN IMMEDIATE: конкурирующие писатели ждут блокировку (busy_timeout) уже на старте,
+# а не получают "database is locked" при попытке записи посреди транзакции
+
+WRITE_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '10000'))
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', '65536'))
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+
+def database_url(url):
+    # Многие хостинги выдают адрес вида postgres://, SQLAlchemy понимает только postgresql://
+    if url.startswith('postgres://'):
+        return 'postgresql://' + url[len('postgres://'):]
+    return url
+
+def is_sqlite_file(url):
+    url = make_url(url)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+def engine_options(url):
+    # Значение для SQLALCHEMY_ENGINE_OPTIONS
+    if not is_sqlite_file(url):
+        return {'pool_pre_ping': True}
+    return {
+        # Размер пула - по числу потоков воркера, которые обслуживают обычные запросы
+        # (gunicorn.conf.py задает GUNICORN_THREADS - EVENTS_MAX_STREAMS)
+        'pool_size': int(os.getenv('DB_POOL_SIZE', '8')),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '4')),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', '30')),
+        'connect_args': {'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000},
+    }
+
+def read_only_transaction(view):
+    # Запрос с методом записи, который почти не пишет (например, вход): обычный BEGIN,
+    # чтобы медленная проверка пароля не держала блокировку записи
+    view.read_only_transaction = True
+    return view
+
+def _begin_statement():
+    if not has_request_context() or request.method not in WRITE_METHODS:
+        return 'BEGIN'
+    view = current_app.view_functions.get(request.endpoint)
+    if getattr(view, 'read_only_transaction', False):
+        return 'BEGIN'
+    return 'BEGIN IMMEDIATE'
+
+def configure_sqlite(engine):
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        # Транзакциями управляем сами (см. _on_begin), драйвер не должен открывать их неявно
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+        cursor.execute(f'PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}')
+        cursor.execute(f'PRAGMA mmap_size={SQLITE_MMAP_SIZE}')
+        cursor.execute('PRAGMA temp_store=MEMORY')
+        cursor.close()
+
+    @event.listens_for(engine, 'begin')
+    def _on_begin(connection):
+        connection.exec_driver_sql(_begin_statement())
+
+def init_app(app):
+    from models import db
+
+    with app.app_context():
+        for engine in db.engines.values():
+            if is_sqlite_file(engine.url):
+                configure_sqlite(engine)
@@ -0,0 +1,276 @@
+import argparse
+import random
+import time
+from array import array
+from datetime import datetime, timedelta
+from itertools import islice
+from sqlalchemy import insert, text
+from werkzeug.security import generate_password_hash
+from models import db, User, Project, Task, Comment, project_members, task_assigneess
+from models import UserRole, ProjectRole, TaskPriority, TaskCategory, TaskStatus, Color
+
+# Генератор тестовых данных. Строки создаются потоком и вставляются пакетными Core-запросами
+# по chunk_size штук; пароль у всех пользователей один - хэш считается один раз.
+# При одинаковых параметрах и seed получается одна и та же база.
+# Большие объемы грузятся в пустые таблицы без вторичных индексов, полнотекстового поиска
+# и счетчиков сводки - все это затем строится разом миграцией (migrations.upgrade).
+# Запуск из каталога Backend:
+#   python datagen.py --reset --users 10000 --projects 1000 --tasks 1000000 --comments 5000000
+
+DEFAULT_PASSWORD = 'password123'
+DEFAULT_START = datetime(2025, 1, 1)
+
+STATUSES = [s.value for s in TaskStatus]
+PRIORITIES = [p.value for p in TaskPriority]
+CATEGORIES = [c.value for c in TaskCategory]
+COLORS = [c.value for c in Color]
+
+def insert_chunks(connection, target, rows, chunk_size=10000):
+    # rows - любой итератор словарей; в памяти не больше одного пакета
+    total = 0
+    stmt = insert(target)
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return total
+        connection.execute(stmt, chunk)
+        total += len(chunk)
+
+def reset_sequences(connection):
+    # Явные id не сдвигают последовательности PostgreSQL - выставляем их по max(id)
+    if connection.dialect.name != 'postgresql':
+        return
+    for table in (User.__table__, Project.__table__, Task.__table__, Comment.__table__):
+        connection.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('\"{table.name}\"', 'id'), COALESCE(MAX(id), 1)) FROM \"{table.name}\""
+        ))
+
+class Generator:
+    def __init__(self, users, projects, tasks, comments, members_per_project=10, max_assignees=3,
+                 subtask_ratio=0.3, seed=42, start=DEFAULT_START, days=365, password=DEFAULT_PASSWORD):
+        self.counts = {'users': users, 'projects': projects, 'tasks': tasks, 'comments': comments}
+        self.members_per_project = min(members_per_project, max(users - 1, 0))
+        self.max_assignees = max_assignees
+        self.subtask_ratio = subtask_ratio
+        self.rnd = random.Random(seed)
+        self.start = start
+        self.span = timedelta(days=days).total_seconds()
+        self.password_hash = generate_password_hash(password)
+        # Участники каждого проекта (владелец первым) и проект каждой задачи - для исполнителей
+        # и авторов комментариев
+        self.project_users = {}
+        self.task_projects = array('i', [0])
+        self.task_dates = array('d', [0.0])
+
+    def users(self):
+        for i in range(1, self.counts['users'] + 1):
+            yield {
+                'id': i, 'username': f'user{i}', 'email': f'user{i}@example.com',
+                'password_hash': self.password_hash,
+                'role': UserRole.ADMIN.value if i == 1 else UserRole.CLIENT.value,
+            }
+
+    def projects(self):
+        rnd = self.rnd
+        for i in range(1, self.counts['projects'] + 1):
+            owner = rnd.randint(1, self.counts['users'])
+            self.project_users[i] = [owner]
+            yield {
+                'id': i, 'name': f'Проект {i}', 'description': f'Описание проекта {i}',
+                'color': rnd.choice(COLORS), 'owner': owner,
+                'creation_date': self.start + timedelta(seconds=rnd.uniform(0, self.span / 10)),
+            }
+
+    def memberships(self):
+        rnd = self.rnd
+        for project_id, users in self.project_users.items():
+            owner = users[0]
+            members = set()
+            while len(members) < self.members_per_project:
+                user_id = rnd.randint(1, self.counts['users'])
+                if user_id != owner:
+                    members.add(user_id)
+            for user_id in sorted(members):
+                users.append(user_id)
+                role = ProjectRole.Member.value if rnd.random() < 0.2 else ProjectRole.VIEWER.value
+                yield {'project_id': project_id, 'user_id': user_id, 'role': role}
+
+    def tasks(self):
+        rnd = self.rnd
+        total = self.counts['tasks']
+        step = self.span / max(total, 1)
+        # Последние задачи каждого проекта - кандидаты в родители подзадач
+        recent = {}
+        for i in range(1, total + 1):
+            project_id = rnd.randint(1, self.counts['projects'])
+            candidates = recent.setdefault(project_id, [])
+            parent_id = rnd.choice(candidates) if candidates and rnd.random() < self.subtask_ratio else None
+            candidates.append(i)
+            if len(candidates) > 50:
+                candidates.pop(0)
+
+            offset = i * step
+            created = self.start + timedelta(seconds=offset)
+            self.task_projects.append(project_id)
+            self.task_dates.append(offset)
+            yield {
+                'id': i, 'title': f'Задача {i}', 'description': f'Описание задачи {i}',
+                'priority': rnd.choice(PRIORITIES), 'category': rnd.choice(CATEGORIES),
+                'status': rnd.choice(STATUSES), 'project_id': project_id, 'parent_id': parent_id,
+                'creation_date': created,
+                'deadline_date': created + timedelta(days=rnd.randint(1, 60)) if rnd.random() < 0.8 else None,
+            }
+
+    def assignees(self):
+        rnd = self.rnd
+        for task_id in range(1, len(self.task_projects)):
+            users = self.project_users[self.task_projects[task_id]]
+            for user_id in rnd.sample(users, min(len(users), rnd.randint(0, self.max_assignees))):
+                yield {'task_id': task_id, 'user_id': user_id}
+
+    def comments(self):
+        rnd = self.rnd
+        tasks = len(self.task_projects) - 1
+        if not tasks:
+            return
+        for i in range(1, self.counts['comments'] + 1):
+            task_id = rnd.randint(1, tasks)
+            yield {
+                'id': i, 'text_comment': f'Комментарий {i}', 'task_id': task_id,
+                'author_id': rnd.choice(self.project_users[self.task_projects[task_id]]),
+                'creation_date': self.start + timedelta(seconds=self.task_dates[task_id] + rnd.uniform(0, 7 * 86400)),
+            }
+
+    def load(self, connection, chunk_size=10000, log=None):
+        # Порядок важен: генераторы проектов и задач заполняют данные для следующих таблиц
+        steps = [
+            ('users', User.__table__, self.users),
+            ('projects', Project.__table__, self.projects),
+            ('project_users', project_members, self.memberships),
+            ('tasks', Task.__table__, self.tasks),
+            ('task_assignees', task_assigneess, self.assignees),
+            ('comments', Comment.__table__, self.comments),
+        ]
+        result = {}
+        for name, target, rows in steps:
+            started = time.perf_counter()
+            result[name] = insert_chunks(connection, target, rows(), chunk_size)
+            if log:
+                log(f'{name:<16} {result[name]:>10} строк  {time.perf_counter() - started:8.1f} с')
+        reset_sequences(connection)
+        return result
+
+# Небольшой демонстрационный набор для /api/init-db
+DEMO_USERS = [('admin', UserRole.ADMIN), ('user1', UserRole.CLIENT), ('user2', UserRole.CLIENT)]
+DEMO_PROJECTS = [
+    ('Проект1', 'ОписаниеПроекта1', Color.BLUE, 1),
+    ('Проект2', 'ОписаниеПроекта2', Color.GREEN, 2),
+    ('Проект3', 'ОписаниеПроекта3', Color.ORANGE, 1),
+]
+DEMO_TASKS = [
+    ('Задание1', 'ОписаниеЗадание1', 'High', 'Feature', 'Done', 1, [1, 2]),
+    ('Задание2', 'ОписаниеЗадание2', 'High', 'Feature', 'Done', 1, [1]),
+    ('Задание3', 'ОписаниеЗадание3', 'Critical', 'Bug', 'InProgress', 1, [2]),
+    ('Задание4', 'ОписаниеЗадание4', 'Medium', 'Improvement', 'ToDo', 1, [3]),
+    ('Задание5', 'ОписаниеЗадание5', 'Medium', 'Feature', 'InProgress', 2, [2]),
+    ('Задание6', 'ОписаниеЗадание6', 'Low', 'Documentation', 'Done', 2, [1]),
+    ('Задание7', 'ОписаниеЗадание7', 'Low', 'Documentation', 'ToDo', 3, [1, 3]),
+]
+DEMO_COMMENTS = [('Коммент1', 1, 1), ('Коммент2', 1, 2), ('Коммент3', 2, 3), ('Коммент4', 3, 1)]
+
+def load_demo(connection, password=DEFAULT_PASSWORD, seed=None):
+    rnd = random.Random(seed)
+    now = datetime.now()
+    password_hash = generate_password_hash(password)
+    connection.execute(insert(User), [
+        {'id': i, 'username': name, 'email': f'{name}@example.com', 'password_hash': password_hash, 'role': role.value}
+        for i, (name, role) in enumerate(DEMO_USERS, 1)
+    ])
+    connection.execute(insert(Project), [
+        {'id': i, 'name': name, 'description': description, 'color': color.value, 'owner': owner, 'creation_date': now}
+        for i, (name, description, color, owner) in enumerate(DEMO_PROJECTS, 1)
+    ])
+    connection.execute(insert(Task), [
+        {'id': i, 'title': title, 'description': description, 'priority': priority, 'category': category,
+         'status': status, 'project_id': project_id, 'creation_date': now,
+         'deadline_date': now + timedelta(days=rnd.randint(5, 30))}
+        for i, (title, description, priority, category, status, project_id, _) in enumerate(DEMO_TASKS, 1)
+    ])
+    connection.execute(insert(task_assigneess), [
+        {'task_id': i, 'user_id': user_id}
+        for i, task in enumerate(DEMO_TASKS, 1) for user_id in task[-1]
+    ])
+    connection.execute(insert(Comment), [
+        {'text_comment': text_comment, 'task_id': task_id, 'author_id': author_id, 'creation_date': now}
+        for text_comment, task_id, author_id in DEMO_COMMENTS
+    ])
+    reset_sequences(connection)
+    return {'users': len(DEMO_USERS), 'projects': len(DEMO_PROJECTS),
+            'tasks': len(DEMO_TASKS), 'comments': len(DEMO_COMMENTS)}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Генерация тестовых данных')
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--projects', type=int, default=1000)
+    parser.add_argument('--tasks', type=int, default=100000)
+    parser.add_argument('--comments', type=int, default=500000)
+    parser.add_argument('--members-per-project', type=int, default=10)
+    parser.add_argument('--max-assignees', type=int, default=3)
+    parser.add_argument('--subtask-ratio', type=float, default=0.3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--password', default=DEFAULT_PASSWORD)
+    parser.add_argument('--reset', action='store_true', help='удалить и заново создать все таблицы')
+    return parser.parse_args()
+
+def main():
+    from app import create_app
+    from migrations import upgrade
+    from search import drop_search_index
+    from stats import drop_stats_rollup
+
+    args = parse_args()
+    with create_app().app_context():
+        engine = db.engine
+        if args.reset:
+            db.drop_all()
+            db.create_all()
+        elif db.session.query(User.id).first():
+            # Генератор задает id явно и рассчитан на пустую базу
+            raise SystemExit('База не пуста - запустите с --reset')
+        db.session.remove()
+        # Индексы, полнотекстовый поиск и счетчики строятся после загрузки, а не на каждую строку
+        with engine.begin() as connection:
+            drop_search_index(connection)
+            drop_stats_rollup(connection)
+            for table in db.metadata.sorted_tables:
+                for index in table.indexes:
+                    # Не через checkfirst: индексы по выражениям на SQLite не отражаются и не удалились бы
+                    connection.execute(text(f'DROP INDEX IF EXISTS {index.name}'))
+
+        generator = Generator(
+            args.users, args.projects, args.tasks, args.comments,
+            members_per_project=args.members_per_project, max_assignees=args.max_assignees,
+            subtask_ratio=args.subtask_ratio, seed=args.seed, password=args.password,
+        )
+        started = time.perf_counter()
+        with engine.connect() as connection:
+            sqlite = connection.dialect.name == 'sqlite'
+            if sqlite:
+                # Загрузка одной транзакцией, надежность записи на диск здесь не нужна.
+                # Прагма меняется только вне транзакции - напрямую через драйвер
+                connection.connection.driver_connection.execute('PRAGMA synchronous=OFF')
+            with connection.begin():
+                generator.load(connection, args.chunk_size, log=print)
+            if sqlite:
+                connection.connection.driver_connection.execute('PRAGMA synchronous=NORMAL')
+
+        index_started = time.perf_counter()
+        db.session.remove()
+        upgrade(engine)
+        print(f'Индексы, поиск и счетчики: {time.perf_counter() - index_started:.1f} с')
+        print(f'Всего: {time.perf_counter() - started:.1f} с')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+import warnings
+from datetime import datetime
+from sqlalchemy import exc, inspect, select, text
+from models import db, User, Project, Task, Comment
+from cache import TTLCache
+from pagination import encode_cursor, decode_cursor
+
+# Сведения о базе для администратора. Стоимость не зависит от объема данных:
+# число строк берется из статистики планировщика (sqlite_stat1 после ANALYZE, pg_stat_user_tables),
+# размеры и использование индексов на PostgreSQL - из системных представлений.
+# На SQLite размеры таблиц и индексов требуют обхода всех страниц файла (dbstat), поэтому
+# считаются только по явному запросу. Результат кэшируется на DB_STATS_CACHE_TTL секунд.
+# Выборка строк таблиц - отдельным постраничным запросом
+
+stats_cache = TTLCache(maxsize=0, ttl=0, name='db_stats')
+
+# Таблицы, доступные для просмотра строк, и выводимые колонки
+SAMPLE_TABLES = {
+    'user': (User, ['id', 'username', 'email', 'role']),
+    'project': (Project, ['id', 'name', 'owner', 'creation_date']),
+    'task': (Task, ['id', 'title', 'status', 'project_id', 'creation_date']),
+    'comment': (Comment, ['id', 'task_id', 'author_id', 'creation_date']),
+}
+
+def init_app(app):
+    stats_cache.maxsize = 4
+    stats_cache.ttl = app.config.get('DB_STATS_CACHE_TTL', 60)
+    stats_cache.clear()
+
+def _structure(connection):
+    inspector = inspect(connection)
+    tables = {}
+    with warnings.catch_warnings():
+        # Индексы по выражениям SQLAlchemy на SQLite пропускает с предупреждением
+        warnings.simplefilter('ignore', exc.SAWarning)
+        for name in inspector.get_table_names():
+            tables[name] = {
+                'rows': None,
+                'indexes': {
+                    index['name']: {'columns': index['column_names'], 'unique': bool(index.get('unique'))}
+                    for index in inspector.get_indexes(name)
+                },
+            }
+    return tables
+
+def _sqlite_stats(connection, tables, sizes):
+    pragma = lambda name: connection.execute(text(f'PRAGMA {name}')).scalar()
+    page_size = pragma('page_size')
+    database = {
+        'size_bytes': pragma('page_count') * page_size,
+        'free_bytes': pragma('freelist_count') * page_size,
+        'analyzed': False,
+    }
+
+    analyzed = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+    ).first()
+    if analyzed:
+        database['analyzed'] = True
+        # Первое число stat - строк в таблице на момент ANALYZE, остальные - строк на значение ключа
+        for table, index, stat in connection.execute(text('SELECT tbl, idx, stat FROM sqlite_stat1')):
+            if table not in tables:
+                continue
+            numbers = [int(n) for n in stat.split() if n.isdigit()]
+            if numbers:
+                tables[table]['rows'] = max(tables[table]['rows'] or 0, numbers[0])
+            if index in tables[table]['indexes']:
+                tables[table]['indexes'][index]['rows_per_key'] = numbers[1:]
+
+    if 'task_stats' in tables and 'task' in tables:
+        # Точное число задач - из счетчиков сводки по проектам (см. stats.py)
+        tables['task']['rows'] = connection.execute(
+            text("SELECT COALESCE(SUM(count), 0) FROM task_stats WHERE dimension = 'total'")
+        ).scalar()
+        tables['task']['rows_exact'] = True
+
+    if sizes:
+        owners = dict(connection.execute(
+            text("SELECT name, tbl_name FROM sqlite_master WHERE type IN ('table', 'index')")
+        ).all())
+        for name, size in connection.execute(text('SELECT name, SUM(pgsize) FROM dbstat GROUP BY name')):
+            table = tables.get(owners.get(name))
+            if table is None:
+                continue
+            if name == owners[name]:
+                table['size_bytes'] = size
+            else:
+                table['indexes_size_bytes'] = table.get('indexes_size_bytes', 0) + size
+                if name in table['indexes']:
+                    table['indexes'][name]['size_bytes'] = size
+    return database
+
+def _postgresql_stats(connection, tables):
+    database = {'size_bytes': connection.execute(text('SELECT pg_database_size(current_database())')).scalar()}
+    for name, rows, size, indexes_size, seq_scan, idx_scan in connection.execute(text("""
+        SELECT relname, n_live_tup, pg_relation_size(relid), pg_indexes_size(relid), seq_scan, idx_scan
+        FROM pg_stat_user_tables
+    """)):
+        if name in tables:
+            tables[name].update(rows=rows, size_bytes=size, indexes_size_bytes=indexes_size,
+                                seq_scans=seq_scan, index_scans=idx_scan)
+    for table, index, scans, size in connection.execute(text("""
+        SELECT relname, indexrelname, idx_scan, pg_relation_size(indexrelid) FROM pg_stat_user_indexes
+    """)):
+        if table in tables:
+            tables[table]['indexes'].setdefault(index, {}).update(scans=scans, size_bytes=size)
+    return database
+
+def _collect(sizes):
+    connection = db.session.connection()
+    dialect = connection.dialect.name
+    tables = _structure(connection)
+    if dialect == 'sqlite':
+        database = _sqlite_stats(connection, tables, sizes)
+    elif dialect == 'postgresql':
+        database = _postgresql_stats(connection, tables)
+    else:
+        database = {}
+    return {
+        'backend': dialect,
+        'database': database,
+        'tables': tables,
+        'generated_at': datetime.utcnow().isoformat(),
+    }
+
+def database_stats(sizes=False):
+    key = ('stats', sizes)
+    result = stats_cache.get(key)
+    if result is None:
+        result = _collect(sizes)
+        stats_cache.set(key, result)
+    return result
+
+def sample_rows(table, limit, cursor=None):
+    # Страница строк таблицы по возрастанию id
+    model, names = SAMPLE_TABLES[table]
+    columns = [getattr(model, name) for name in names]
+    query = select(*columns).order_by(model.id).limit(limit + 1)
+    if cursor:
+        query = query.where(model.id > decode_cursor(cursor, int)[0])
+    rows = db.session.execute(query).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].id)
+    items = [
+        {name: value.isoformat() if isinstance(value, datetime) else value for name, value in zip(names, row)}
+        for row in rows
+    ]
+    return {'table': table, 'columns': names, 'items': items, 'next_cursor': next_cursor}
@@ -0,0 +1,214 @@
+import heapq
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from models import db, Task, TaskStatus
+from access import accessible_project_ids
+from serializers import task_rows
+from pagination import keyset_page
+import events
+
+# Дедлайны задач.
+# Выборка "срок в интервале" и просроченные задачи - диапазон по индексу deadline_date
+# (для проекта - по (project_id, deadline_date)) с постраничной выдачей по (deadline_date, id).
+# Планировщик держит в памяти процесса min-кучу ближайших срабатываний: за DEADLINE_DUE_SOON_MINUTES
+# до срока (task.due) и в момент срока (task.overdue). Куча заполняется лениво - фоновым потоком
+# воркера, окном [сейчас, сейчас + DEADLINE_DUE_SOON_MINUTES + DEADLINE_HORIZON_MINUTES] по индексу,
+# окно перечитывается раз в DEADLINE_REFRESH_SECONDS. Изменения задач в этом процессе попадают
+# в кучу сразу (schedule/unschedule), устаревшие записи кучи пропускаются при извлечении.
+# Сработавшие записи сверяются с БД одним запросом на пачку (задача могла измениться в другом
+# воркере или удалиться вместе с родителем) и публикуются в ленту проекта одним событием
+# {"ids": [...]} на проект и вид. Планировщик должен работать в одном процессе, иначе события
+# дублируются: под gunicorn DEADLINE_SCHEDULER выключается, и хук pre_fork в gunicorn.conf.py
+# включает его ровно в одном воркере (enable)
+
+logger = logging.getLogger(__name__)
+
+DUE = 'due'
+OVERDUE = 'overdue'
+
+def due_tasks(user_id, start=None, end=None, project_id=None, include_done=False, limit=100, cursor=None):
+    # Задачи доступных пользователю проектов со сроком в [start, end), по возрастанию срока
+    query = db.session.query(*task_rows.columns).filter(
+        Task.project_id.in_(accessible_project_ids(user_id)),
+        Task.deadline_date.isnot(None)
+    )
+    if project_id is not None:
+        query = query.filter(Task.project_id == project_id)
+    if start is not None:
+        query = query.filter(Task.deadline_date >= start)
+    if end is not None:
+        query = query.filter(Task.deadline_date < end)
+    if not include_done:
+        query = query.filter(Task.status != TaskStatus.DONE.value)
+
+    return keyset_page(
+        query, [Task.deadline_date, Task.id],
+        key=lambda t: (t.deadline_date, t.id),
+        limit=limit,
+        cursor=cursor
+    )
+
+class DeadlineScheduler:
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self._condition = threading.Condition()
+        self._pid = None
+        self._reset()
+
+    def _reset(self):
+        # Элементы кучи: (время срабатывания, id задачи, вид, срок). Актуальный срок задачи -
+        # в _scheduled; запись кучи с другим сроком устарела
+        self._heap = []
+        self._scheduled = {}
+        self._loaded_until = None
+        self._started_at = datetime.now()
+
+    def configure(self, app):
+        self.app = app
+        self.enabled = app.config.get('DEADLINE_SCHEDULER', False)
+        self.lead = timedelta(minutes=app.config.get('DEADLINE_DUE_SOON_MINUTES', 60))
+        self.horizon = timedelta(minutes=app.config.get('DEADLINE_HORIZON_MINUTES', 60))
+        self.refresh_seconds = app.config.get('DEADLINE_REFRESH_SECONDS', 60)
+        self.batch_size = app.config.get('DEADLINE_BATCH_SIZE', 500)
+        with self._condition:
+            self._reset()
+
+    def ensure_started(self):
+        # Поток запускается в процессе, который обслуживает запросы (после fork воркера gunicorn)
+        if not self.enabled or self._pid == os.getpid():
+            return
+        with self._condition:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._reset()
+            threading.Thread(target=self._run, name='deadline-scheduler', daemon=True).start()
+
+    # Изменения задач этого процесса (после commit)
+
+    def schedule(self, tasks):
+        if not self.enabled:
+            return
+        with self._condition:
+            head = self._heap[0] if self._heap else None
+            for task in tasks:
+                if task.deadline_date is None or task.status == TaskStatus.DONE.value:
+                    self._scheduled.pop(task.id, None)
+                else:
+                    self._push(task.id, task.deadline_date)
+            if self._heap and self._heap[0] is not head:
+                self._condition.notify()
+
+    def unschedule(self, task_ids):
+        if not self.enabled:
+            return
+        with self._condition:
+            for task_id in task_ids:
+                self._scheduled.pop(task_id, None)
+
+    def _push(self, task_id, deadline):
+        if self._loaded_until is None or deadline > self._loaded_until:
+            # Окно еще не загружено или срок за его краем - задача попадет в кучу при загрузке
+            self._scheduled.pop(task_id, None)
+            return
+        if self._scheduled.get(task_id) == deadline:
+            return
+        self._scheduled[task_id] = deadline
+        for kind, fire_at in ((DUE, deadline - self.lead), (OVERDUE, deadline)):
+            # Срабатывания, пропущенные до старта процесса, не повторяются
+            if fire_at >= self._started_at:
+                heapq.heappush(self._heap, (fire_at, task_id, kind, deadline))
+
+    # Фоновый поток
+
+    def _load_window(self):
+        now = datetime.now()
+        until = now + self.lead + self.horizon
+        with self.app.app_context():
+            rows = db.session.execute(
+                select(Task.id, Task.deadline_date).where(
+                    Task.deadline_date >= now,
+                    Task.deadline_date <= until,
+                    Task.status != TaskStatus.DONE.value
+                )
+            ).all()
+        with self._condition:
+            self._loaded_until = until
+            for task_id, deadline in rows:
+                self._push(task_id, deadline)
+
+    def _pop_fired(self, now):
+        fired = []
+        with self._condition:
+            while self._heap and self._heap[0][0] <= now:
+                fire_at, task_id, kind, deadline = heapq.heappop(self._heap)
+                if self._scheduled.get(task_id) != deadline:
+                    continue
+                if kind == OVERDUE:
+                    del self._scheduled[task_id]
+                fired.append((task_id, kind, deadline))
+        return fired
+
+    def _emit(self, fired):
+        with self.app.app_context():
+            for start in range(0, len(fired), self.batch_size):
+                chunk = fired[start:start + self.batch_size]
+                current = {
+                    task_id: (project_id, deadline, status)
+                    for task_id, project_id, deadline, status in db.session.execute(
+                        select(Task.id, Task.project_id, Task.deadline_date, Task.status)
+                        .where(Task.id.in_({task_id for task_id, kind, deadline in chunk}))
+                    )
+                }
+                batches = {}
+                for task_id, kind, deadline in chunk:
+                    row = current.get(task_id)
+                    if row and row[1] == deadline and row[2] != TaskStatus.DONE.value:
+                        batches.setdefault((row[0], kind), []).append(task_id)
+                for (project_id, kind), ids in batches.items():
+                    events.publish(project_id, f'task.{kind}', {"ids": ids})
+
+    def _run(self):
+        next_refresh = 0
+        while True:
+            if time.monotonic() >= next_refresh:
+                try:
+                    self._load_window()
+                except Exception:
+                    logger.exception('Не удалось загрузить окно дедлайнов')
+                next_refresh = time.monotonic() + self.refresh_seconds
+
+            fired = self._pop_fired(datetime.now())
+            if fired:
+                try:
+                    self._emit(fired)
+                except Exception:
+                    logger.exception('Не удалось опубликовать события дедлайнов')
+
+            with self._condition:
+                timeout = next_refresh - time.monotonic()
+                if self._heap:
+                    timeout = min(timeout, (self._heap[0][0] - datetime.now()).total_seconds())
+                if timeout > 0:
+                    self._condition.wait(timeout)
+
+scheduler = DeadlineScheduler()
+
+def init_app(app):
+    scheduler.configure(app)
+    app.before_request(scheduler.ensure_started)
+
+def enable():
+    # Включение в выбранном процессе после загрузки приложения (воркер gunicorn)
+    scheduler.enabled = True
+
+def schedule(tasks):
+    scheduler.schedule(tasks)
+
+def unschedule(task_ids):
+    scheduler.unschedule(task_ids)
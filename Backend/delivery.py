@@ -0,0 +1,163 @@
+import gzip
+import mimetypes
+import os
+import re
+import sys
+from flask import abort, current_app, request, send_file
+
+try:
+    import brotli
+except ImportError:
+    # Без пакета Brotli остается только gzip
+    brotli = None
+
+# Отдача собранного фронтенда и сжатие ответов API.
+# Файлы сборки индексируются один раз при старте (без stat на каждый запрос), рядом с ними
+# заранее создаются .gz/.br копии; клиенту отдается лучшая из поддерживаемых им кодировок.
+# Файлы с хэшем содержимого в имени (main.1a2b3c4d.js) кэшируются браузером навсегда,
+# остальные (index.html, manifest.json) - с обязательной перепроверкой.
+# Список файлов обновляется только при перезапуске - после пересборки фронтенда
+
+COMPRESSIBLE_EXTENSIONS = {'.html', '.js', '.css', '.json', '.map', '.svg', '.txt', '.xml', '.ico', '.webmanifest'}
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson', 'text/html', 'text/plain'}
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+HASHED_NAME = re.compile(r'\.[0-9a-f]{8,}(\.chunk)?\.\w+(\.map)?$')
+
+def available_encodings():
+    # В порядке предпочтения сервера
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+def compress(data, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+def _is_stale(source, target):
+    return not os.path.exists(target) or os.path.getmtime(target) < os.path.getmtime(source)
+
+def precompress(folder, min_size=1024):
+    # Создает рядом с файлами сборки сжатые копии (максимальная степень сжатия - делается
+    # один раз). Запись через временный файл: воркеры могут делать это одновременно
+    created = []
+    for root, _, names in os.walk(folder):
+        for name in names:
+            path = os.path.join(root, name)
+            if os.path.splitext(name)[1] not in COMPRESSIBLE_EXTENSIONS or os.path.getsize(path) < min_size:
+                continue
+            data = None
+            for encoding in available_encodings():
+                target = path + ENCODING_SUFFIXES[encoding]
+                if not _is_stale(path, target):
+                    continue
+                if data is None:
+                    with open(path, 'rb') as f:
+                        data = f.read()
+                compressed = compress(data, encoding, 11 if encoding == 'br' else 9)
+                if len(compressed) >= len(data):
+                    continue
+                tmp = f'{target}.{os.getpid()}.tmp'
+                with open(tmp, 'wb') as f:
+                    f.write(compressed)
+                os.replace(tmp, target)
+                created.append(target)
+    return created
+
+class StaticIndex:
+    def __init__(self, folder):
+        self.folder = folder
+        self.files = {}
+        self.refresh()
+
+    def refresh(self):
+        files = {}
+        skipped = set(ENCODING_SUFFIXES.values()) | {'.tmp'}
+        for root, _, names in os.walk(self.folder):
+            for name in names:
+                if os.path.splitext(name)[1] in skipped:
+                    continue
+                path = os.path.join(root, name)
+                rel = os.path.relpath(path, self.folder).replace(os.sep, '/')
+                variants = {
+                    encoding: path + suffix for encoding, suffix in ENCODING_SUFFIXES.items()
+                    if os.path.exists(path + suffix)
+                }
+                files[rel] = {
+                    'path': path,
+                    'mimetype': mimetypes.guess_type(name)[0] or 'application/octet-stream',
+                    'variants': variants,
+                    'immutable': bool(HASHED_NAME.search(name)),
+                }
+        self.files = files
+
+    def get(self, path):
+        return self.files.get(path)
+
+    def send(self, path):
+        entry = self.files[path]
+        accepted = [e for e in available_encodings() if e in entry['variants']]
+        encoding = request.accept_encodings.best_match(accepted) if accepted else None
+        # max_age=None - Cache-Control: no-cache, браузер перепроверяет файл по ETag
+        max_age = IMMUTABLE_MAX_AGE if entry['immutable'] else None
+        path = entry['variants'][encoding] if encoding else entry['path']
+        response = send_file(path, mimetype=entry['mimetype'], conditional=True, max_age=max_age)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if entry['variants']:
+            response.vary.add('Accept-Encoding')
+        if entry['immutable']:
+            response.cache_control.immutable = True
+        return response
+
+def _compress_response(app):
+    min_size = app.config.get('COMPRESS_MIN_SIZE', 1024)
+    levels = {'gzip': app.config.get('COMPRESS_LEVEL', 6), 'br': app.config.get('COMPRESS_BROTLI_QUALITY', 4)}
+
+    def compress_response(response):
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+        response.vary.add('Accept-Encoding')
+        if (response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers
+                or not 200 <= response.status_code < 300 or response.status_code in (204, 206)
+                or (response.content_length or 0) < min_size):
+            return response
+        encoding = request.accept_encodings.best_match(available_encodings())
+        if not encoding:
+            return response
+        response.set_data(compress(response.get_data(), encoding, levels[encoding]))
+        response.headers['Content-Encoding'] = encoding
+        # Сильный ETag относится к байтам ответа - у сжатого представления они другие
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    return compress_response
+
+def init_app(app):
+    folder = os.path.join(app.root_path, app.config.get('STATIC_FOLDER', 'static'))
+    if app.config.get('STATIC_PRECOMPRESS', True) and os.path.isdir(folder):
+        try:
+            precompress(folder, app.config.get('COMPRESS_MIN_SIZE', 1024))
+        except OSError as e:
+            # Папка сборки только для чтения - файлы отдаются как есть
+            app.logger.warning('Не удалось сжать статические файлы: %s', e)
+    app.extensions['static_index'] = StaticIndex(folder)
+    if app.config.get('COMPRESS_RESPONSES', True):
+        app.after_request(_compress_response(app))
+
+def send_static(path):
+    # Файл сборки, а для остальных путей - index.html (маршрутизация на стороне React)
+    static_index = current_app.extensions['static_index']
+    if path and static_index.get(path):
+        return static_index.send(path)
+    if not static_index.get('index.html'):
+        abort(404)
+    return static_index.send('index.html')
+
+if __name__ == '__main__':
+    # Сжатие на этапе сборки образа: python delivery.py static
+    folder = sys.argv[1] if len(sys.argv) > 1 else 'static'
+    created = precompress(folder)
+    print(f'Сжато файлов: {len(created)}')
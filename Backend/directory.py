@@ -0,0 +1,96 @@
+from sqlalchemy import and_, func, not_, or_, select, union
+from models import db, User, Project, project_members
+from pagination import DEFAULT_PAGE_SIZE, encode_cursor, decode_cursor, keyset_after
+
+# Справочник пользователей для выбора исполнителей и участников: поиск по началу имени или
+# email, постраничная выдача и выбор полей. Поиск - диапазон по индексам lower(username)
+# и lower(email), поэтому страница стоит одинаково при любом числе пользователей.
+# Сначала идут совпадения по имени (по алфавиту), затем совпадения только по email;
+# курсор хранит этап, ключ и id последней строки.
+# SQLite приводит к нижнему регистру только латиницу - префикс приводится так же
+
+USERNAME_KEY = func.lower(User.username)
+EMAIL_KEY = func.lower(User.email)
+
+_ASCII_LOWER = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')
+
+def _fold(prefix):
+    if db.session.get_bind().dialect.name == 'sqlite':
+        return prefix.translate(_ASCII_LOWER)
+    return prefix.lower()
+
+def _starts_with(key, prefix):
+    # Диапазон prefix <= key < (prefix с увеличенным последним символом) читается по индексу,
+    # LIKE отсекает строки, которые попали в диапазон из-за правил сортировки СУБД
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return and_(key >= prefix, key < upper, key.startswith(prefix, autoescape=True))
+
+def _columns(fields):
+    return [User.id] + [getattr(User, name) for name in fields if name != 'id']
+
+def _page(rows, fields, limit, cursor_of):
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = cursor_of(rows[-1])
+    items = [{name: getattr(row, name) for name in fields} for row in rows]
+    return {'items': items, 'next_cursor': next_cursor}
+
+def list_users(fields, limit=None, cursor=None):
+    # Все пользователи по возрастанию id
+    limit = limit or DEFAULT_PAGE_SIZE
+    query = select(*_columns(fields)).order_by(User.id).limit(limit + 1)
+    if cursor:
+        query = query.where(User.id > decode_cursor(cursor, int)[0])
+    rows = db.session.execute(query).all()
+    return _page(rows, fields, limit, lambda row: encode_cursor(row.id))
+
+def search_users(prefix, fields, limit=None, cursor=None):
+    limit = limit or DEFAULT_PAGE_SIZE
+    prefix = _fold(prefix)
+    stage, key, after = decode_cursor(cursor, int, str, int) if cursor else (1, None, None)
+    stages = [
+        (1, USERNAME_KEY, None),
+        # Совпавшие и по имени уже выданы на первом этапе
+        (2, EMAIL_KEY, _starts_with(USERNAME_KEY, prefix)),
+    ]
+
+    rows = []
+    for number, sort_key, exclude in stages:
+        if number < stage:
+            continue
+        query = select(*_columns(fields), sort_key.label('sort_key'))
+        query = query.where(_starts_with(sort_key, prefix))
+        if exclude is not None:
+            query = query.where(not_(exclude))
+        if number == stage and key is not None:
+            query = query.where(keyset_after([sort_key, User.id], [key, after]))
+        query = query.order_by(sort_key, User.id).limit(limit + 1 - len(rows))
+        rows += [(number, row) for row in db.session.execute(query)]
+        if len(rows) > limit:
+            break
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        number, row = rows[-1]
+        next_cursor = encode_cursor(number, row.sort_key, row.id)
+    items = [{name: getattr(row, name) for name in fields} for _, row in rows]
+    return {'items': items, 'next_cursor': next_cursor}
+
+def project_users(project_id, fields, prefix=None, limit=None, cursor=None):
+    # Участники проекта вместе с владельцем; проект небольшой - поиск фильтром внутри него
+    limit = limit or DEFAULT_PAGE_SIZE
+    member_ids = union(
+        select(Project.owner.label('user_id')).where(Project.id == project_id),
+        select(project_members.c.user_id).where(project_members.c.project_id == project_id)
+    ).subquery()
+    query = select(*_columns(fields)).join(member_ids, member_ids.c.user_id == User.id)
+    if prefix:
+        prefix = _fold(prefix)
+        query = query.where(or_(USERNAME_KEY.startswith(prefix, autoescape=True),
+                                EMAIL_KEY.startswith(prefix, autoescape=True)))
+    if cursor:
+        query = query.where(User.id > decode_cursor(cursor, int)[0])
+    rows = db.session.execute(query.order_by(User.id).limit(limit + 1)).all()
+    return _page(rows, fields, limit, lambda row: encode_cursor(row.id))
@@ -0,0 +1,231 @@
+import itertools
+import json
+import logging
+import secrets
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, insert, select
+from flask import g, has_request_context
+from werkzeug.utils import import_string
+from models import db, ProjectEvent
+
+# Лента изменений проекта. Брокер хранит последние события каждого проекта и будит ожидающих
+# подписчиков. Интерфейс брокера (EVENT_BROKER в конфиге): publish, wait, last_id, drop.
+# id событий для клиента непрозрачны (строки): брокер сам решает, продолжается ли лента
+# с переданного Last-Event-ID или клиенту нужен reset.
+# LocalBroker - кольцевые буферы в памяти одного процесса (разработка, один воркер).
+# DatabaseBroker - таблица project_event, общая для всех воркеров; нужен при нескольких воркерах
+
+logger = logging.getLogger(__name__)
+
+class LocalBroker:
+    def __init__(self, buffer_size=256):
+        self.buffer_size = buffer_size
+        # id события - "<метка процесса>-<номер>": id из другого воркера или прошлого запуска
+        # не совпадает по метке, и подписчик получает reset вместо тихой потери событий
+        self._token = secrets.token_hex(4)
+        self._seq = itertools.count(1)
+        self._last = 0
+        self._buffers = {}
+        self._evicted = {}
+        self._condition = threading.Condition()
+
+    def init_app(self, app):
+        pass
+
+    def _parse(self, event_id):
+        token, _, seq = str(event_id).partition('-')
+        if token != self._token or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def publish(self, project_id, event_type, data):
+        with self._condition:
+            seq = next(self._seq)
+            event = {'id': f'{self._token}-{seq}', 'seq': seq, 'type': event_type, 'data': data}
+            buffer = self._buffers.get(project_id)
+            if buffer is None:
+                buffer = self._buffers[project_id] = deque(maxlen=self.buffer_size)
+            if len(buffer) == buffer.maxlen:
+                self._evicted[project_id] = buffer[0]['seq']
+            buffer.append(event)
+            self._last = seq
+            self._condition.notify_all()
+            return event['id']
+
+    def drop(self, project_id):
+        with self._condition:
+            self._buffers.pop(project_id, None)
+            self._evicted.pop(project_id, None)
+
+    def last_id(self, project_id):
+        with self._condition:
+            return f'{self._token}-{self._last}'
+
+    def _since(self, project_id, last_id):
+        # (события после last_id, полон ли ответ). Неполный ответ - часть событий потеряна:
+        # вытеснена из буфера, случилась до старта процесса или id выдан другим воркером
+        seq = self._parse(last_id)
+        if seq is None or seq > self._last:
+            return [], False
+        if seq < self._evicted.get(project_id, 0):
+            return [], False
+        buffer = self._buffers.get(project_id) or ()
+        return [e for e in buffer if e['seq'] > seq], True
+
+    def wait(self, project_id, last_id, timeout):
+        # Ждет события после last_id не дольше timeout: (события, полон ли ответ)
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                events, complete = self._since(project_id, last_id)
+                if events or not complete:
+                    return events, complete
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return [], True
+                self._condition.wait(remaining)
+
+class DatabaseBroker:
+    # События пишутся в project_event после commit изменений, подписчики опрашивают таблицу
+    # раз в EVENT_POLL_SECONDS (события своего воркера будят их сразу).
+    # Опрос - два запроса по первичному ключу и индексу (project_id, id), без сессии запроса:
+    # SSE-генератор работает вне контекста приложения.
+    # События старше EVENT_RETENTION_SECONDS удаляются; клиент, отставший сильнее, получает reset
+
+    PRUNE_EVERY = 100
+
+    def __init__(self, buffer_size=256):
+        self.buffer_size = buffer_size
+        self.app = None
+        self.poll_seconds = 1
+        self.retention = timedelta(hours=1)
+        self._engine = None
+        self._dumps = json.dumps
+        self._written = 0
+        self._condition = threading.Condition()
+
+    def init_app(self, app):
+        self.app = app
+        self.poll_seconds = app.config.get('EVENT_POLL_SECONDS', 1)
+        self.retention = timedelta(seconds=app.config.get('EVENT_RETENTION_SECONDS', 3600))
+        self._dumps = app.json.dumps
+        app.after_request(self._flush)
+
+    def _connect(self):
+        if self._engine is None:
+            with self.app.app_context():
+                self._engine = db.engine
+        return self._engine
+
+    def publish(self, project_id, event_type, data):
+        row = {'project_id': project_id, 'type': event_type, 'data': self._dumps(data), 'created_at': datetime.now()}
+        if has_request_context():
+            # После commit запрос на запись может снова держать блокировку SQLite (BEGIN IMMEDIATE),
+            # и отдельное подключение ее бы ждало - события запроса пишутся в его же сессии
+            # одним INSERT, когда ответ уже готов
+            g.setdefault('project_events', []).append(row)
+            return None
+        with self._connect().begin() as connection:
+            self._write(connection, [row])
+        self._notify()
+        return None
+
+    def _flush(self, response):
+        rows = g.pop('project_events', None)
+        if rows:
+            try:
+                self._write(db.session.connection(bind_arguments={'bind': self._connect()}), rows)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                logger.exception('Не удалось записать события проектов')
+            self._notify()
+        return response
+
+    def _write(self, connection, rows):
+        connection.execute(insert(ProjectEvent), rows)
+        self._written += len(rows)
+        if self._written >= self.PRUNE_EVERY:
+            self._written = 0
+            self._prune(connection)
+
+    def _notify(self):
+        with self._condition:
+            self._condition.notify_all()
+
+    def _prune(self, connection):
+        # Удаляется непрерывный префикс id, последнее событие остается всегда -
+        # поэтому все события с id меньше минимального оставшегося потеряны
+        boundary = connection.scalar(
+            select(func.min(ProjectEvent.id)).where(ProjectEvent.created_at >= datetime.now() - self.retention)
+        ) or connection.scalar(select(func.max(ProjectEvent.id)))
+        connection.execute(delete(ProjectEvent).where(ProjectEvent.id < boundary))
+
+    def drop(self, project_id):
+        # Строки удалит очистка по возрасту: подписчики других воркеров еще могут их не прочитать
+        pass
+
+    def last_id(self, project_id):
+        with self._connect().connect() as connection:
+            return str(connection.scalar(select(func.max(ProjectEvent.id))) or 0)
+
+    def _since(self, project_id, last_id):
+        try:
+            after = int(last_id)
+        except (TypeError, ValueError):
+            return [], False
+        with self._connect().connect() as connection:
+            first, last = connection.execute(select(func.min(ProjectEvent.id), func.max(ProjectEvent.id))).one()
+            if after > (last or 0) or (first is not None and after < first - 1):
+                return [], False
+            rows = connection.execute(
+                select(ProjectEvent.id, ProjectEvent.type, ProjectEvent.data)
+                .where(ProjectEvent.project_id == project_id, ProjectEvent.id > after)
+                .order_by(ProjectEvent.id)
+                .limit(self.buffer_size)
+            ).all()
+        return [{'id': str(row.id), 'type': row.type, 'data': json.loads(row.data)} for row in rows], True
+
+    def wait(self, project_id, last_id, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            events, complete = self._since(project_id, last_id)
+            if events or not complete:
+                return events, complete
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return [], True
+            with self._condition:
+                self._condition.wait(min(remaining, self.poll_seconds))
+
+broker = LocalBroker()
+# Места для SSE-лент процесса (EVENTS_MAX_STREAMS); None - без ограничения
+_streams = None
+
+def init_app(app):
+    global broker, _streams
+    limit = app.config.get('EVENTS_MAX_STREAMS', 0)
+    _streams = threading.BoundedSemaphore(limit) if limit > 0 else None
+    broker_class = app.config.get('EVENT_BROKER', 'events.LocalBroker')
+    if isinstance(broker_class, str):
+        broker_class = import_string(broker_class)
+    broker = broker_class(buffer_size=app.config.get('EVENT_BUFFER_SIZE', 256))
+    broker.init_app(app)
+
+def publish(project_id, event_type, data):
+    # Вызывается после commit - подписчики не должны увидеть откатившиеся изменения
+    return broker.publish(project_id, event_type, data)
+
+def drop(project_id):
+    broker.drop(project_id)
+
+def open_stream():
+    # Занимает место для ленты; False - все места заняты
+    return _streams is None or _streams.acquire(blocking=False)
+
+def close_stream():
+    if _streams is not None:
+        _streams.release()
@@ -0,0 +1,69 @@
+import multiprocessing
+import os
+
+# Конфигурация production-сервера. Все параметры переопределяются переменными окружения.
+# Плавный перезапуск воркеров: kill -HUP <pid мастера>; при preload_app новый код
+# подхватывается только полным перезапуском мастера (или USR2 + QUIT старого мастера)
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+# Потоки внутри воркера: ввод-вывод БД и долгие SSE-соединения не блокируют весь процесс.
+# Лента событий занимает поток до EVENTS_MAX_STREAM_SECONDS, поэтому число одновременных лент
+# на воркер ограничено (EVENTS_MAX_STREAMS, по умолчанию половина потоков, сверх - 503):
+# остальные потоки всегда свободны для обычных запросов, и пул подключений к БД рассчитан на них
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '32'))
+os.environ.setdefault('EVENTS_MAX_STREAMS', str(threads // 2))
+os.environ.setdefault('DB_POOL_SIZE', str(max(threads - int(os.environ['EVENTS_MAX_STREAMS']), 1)))
+
+# У каждого воркера свои кэши в памяти: роли в проектах (ROLE_CACHE_TTL), версии токенов
+# (TOKEN_STATE_REFRESH_SECONDS), справочники (REFERENCE_CACHE_TTL). Сброс кэша при записи
+# действует только в воркере, обработавшем запрос, - остальные видят изменение по истечении
+# этих интервалов (см. config.py).
+# Лента событий в памяти процесса не видит записей других воркеров - общая лента через БД.
+# Конфиг приложения читает окружение при импорте, поэтому значение задается до загрузки приложения
+if workers > 1:
+    os.environ.setdefault('EVENT_BROKER', 'events.DatabaseBroker')
+
+# Планировщик дедлайнов в каждом воркере дублировал бы события - в приложении он выключен,
+# pre_fork отдает его одному воркеру (и воркеру на замену, если тот завершился)
+deadline_scheduler = os.getenv('DEADLINE_SCHEDULER', '1') == '1'
+os.environ['DEADLINE_SCHEDULER'] = '0'
+
+# Приложение импортируется в мастере до fork - воркеры делят уже загруженный код
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') == '1'
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+# Периодическая замена воркеров ограничивает рост памяти; jitter - чтобы не все сразу
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '5000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '500'))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+def pre_fork(server, worker):
+    worker.deadline_scheduler = deadline_scheduler and not any(
+        getattr(w, 'deadline_scheduler', False) for w in server.WORKERS.values()
+    )
+
+def post_fork(server, worker):
+    if worker.deadline_scheduler:
+        # Без preload конфиг приложения еще не прочитан - хватает переменной окружения
+        os.environ['DEADLINE_SCHEDULER'] = '1'
+    # Соединения, открытые мастером при preload, не должны использоваться несколькими процессами
+    if not preload_app:
+        return
+    from wsgi import app
+    from models import db
+    import replicas
+    import deadlines
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+        replicas.dispose(close=False)
+    if worker.deadline_scheduler:
+        deadlines.enable()
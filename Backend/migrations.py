@@ -0,0 +1,64 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
+from models import db
+from search import create_search_index
+from stats import create_stats_rollup
+
+# Для уже существующих баз: db.create_all() не добавляет колонки и индексы в созданные ранее таблицы.
+# Миграция идемпотентна - добавляются только отсутствующие колонки (у новых колонок должно быть
+# server_default или nullable), индексы, полнотекстовый индекс и счетчики сводки по проектам,
+# после чего обновляется статистика планировщика (ANALYZE)
+
+def _index_names(engine, inspector, table):
+    # Индексы по выражениям (lower(username)) SQLAlchemy на SQLite не отражает - имена из sqlite_master
+    if engine.dialect.name == 'sqlite':
+        with engine.connect() as conn:
+            return set(conn.execute(
+                text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table"), {'table': table}
+            ).scalars())
+    return {ix['name'] for ix in inspector.get_indexes(table)}
+
+def missing_indexes(engine):
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = _index_names(engine, inspector, table.name)
+        missing += [index for index in table.indexes if index.name not in existing]
+    return missing
+
+def missing_columns(engine):
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        missing += [column for column in table.columns if column.name not in existing]
+    return missing
+
+def upgrade(engine):
+    columns = missing_columns(engine)
+    with engine.begin() as conn:
+        for column in columns:
+            table = engine.dialect.identifier_preparer.format_table(column.table)
+            conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {CreateColumn(column).compile(dialect=engine.dialect)}'))
+    db.metadata.create_all(engine)
+    created = missing_indexes(engine)
+    for index in created:
+        index.create(engine)
+    with engine.begin() as conn:
+        create_search_index(conn)
+        create_stats_rollup(conn)
+        conn.execute(text('ANALYZE'))
+    return [index.name for index in created]
+
+if __name__ == '__main__':
+    from app import create_app
+
+    with create_app().app_context():
+        names = upgrade(db.engine)
+        print('Созданы индексы: ' + ', '.join(names) if names else 'Все индексы уже на месте')
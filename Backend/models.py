@@ -1,6 +1,7 @@
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from replicas import RoutingSession
+from passwords import hash_password, verify_password
 from enum import Enum
 
 class UserRole(Enum):
@@ -43,17 +44,20 @@ class Color(Enum):
     VIOLET = "#800080"
     WHITE = "#FFFFFF"
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 task_assigneess = db.Table('task_assignees',
     db.Column('task_id', db.Integer, db.ForeignKey('task.id'), primary_key=True),
-    db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
+    # Первичный ключ покрывает поиск по task_id, для обратной стороны нужен отдельный индекс
+    db.Index('ix_task_assignees_user_id', 'user_id')
 )
 
 project_members = db.Table('project_users',
     db.Column('project_id', db.Integer, db.ForeignKey('project.id'), primary_key=True),
     db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
-    db.Column('role', db.String(32), nullable=False, default=ProjectRole.VIEWER.value)
+    db.Column('role', db.String(32), nullable=False, default=ProjectRole.VIEWER.value),
+    db.Index('ix_project_users_user_id', 'user_id')
 )
 
 
@@ -63,16 +67,28 @@ class User(db.Model):
     email = db.Column(db.String(128), unique=True, nullable=False)
     password_hash = db.Column(db.String(256), nullable=False)
     role = db.Column(db.String(20), nullable=False, default=UserRole.CLIENT.value)
+    # Увеличивается при отзыве токенов: выданные ранее токены перестают приниматься (см. tokens.py)
+    token_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # Поиск по началу имени и email в справочнике пользователей (directory.py)
+    __table_args__ = (
+        db.Index('ix_user_username_lower', db.func.lower(username), id),
+        db.Index('ix_user_email_lower', db.func.lower(email), id),
+    )
 
     comments = db.relationship('Comment', backref='author', lazy=True)
     tasks = db.relationship('Task', secondary=task_assigneess, backref=db.backref('assignees', lazy=True))
     projects = db.relationship('Project', secondary=project_members, backref=db.backref('members', lazy=True))
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        # Хэш с устаревшими параметрами заменяется новым; сохранить его - дело вызывающего
+        valid, new_hash = verify_password(self.password_hash, password)
+        if new_hash:
+            self.password_hash = new_hash
+        return valid
 
 class Project(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -84,6 +100,10 @@ class Project(db.Model):
 
     tasks = db.relationship('Task', backref='project', lazy=True, cascade='all, delete-orphan')
 
+    __table_args__ = (
+        db.Index('ix_project_owner', 'owner'),
+    )
+
 class Task(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(128), nullable=False)
@@ -99,9 +119,52 @@ class Task(db.Model):
     subtasks = db.relationship('Task', backref=db.backref('parent', remote_side=[id]), lazy=True, cascade='all, delete-orphan')
     comments = db.relationship('Comment', backref='task', lazy=True, cascade='all, delete-orphan')
 
+    # Индексы повторяют фильтры TaskFilterSchema: проект + одно из полей фильтра,
+    # хвост (creation_date, id) - ключ постраничной выдачи
+    __table_args__ = (
+        db.Index('ix_task_creation_date_id', 'creation_date', 'id'),
+        db.Index('ix_task_project_creation_date_id', 'project_id', 'creation_date', 'id'),
+        db.Index('ix_task_project_status', 'project_id', 'status', 'creation_date', 'id'),
+        db.Index('ix_task_project_priority', 'project_id', 'priority', 'creation_date', 'id'),
+        db.Index('ix_task_project_category', 'project_id', 'category', 'creation_date', 'id'),
+        db.Index('ix_task_parent_id', 'parent_id'),
+        db.Index('ix_task_deadline_date', 'deadline_date'),
+        # Дедлайны незавершенных задач проекта (сводка /api/projects/<id>/stats)
+        db.Index('ix_task_project_deadline', 'project_id', 'deadline_date'),
+    )
+
 class Comment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     text_comment = db.Column(db.Text, nullable=False)
     creation_date = db.Column(db.DateTime, default=datetime.utcnow)
     task_id = db.Column(db.Integer, db.ForeignKey('task.id'), nullable=False)
     author_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_comment_task_creation_date', 'task_id', 'creation_date'),
+    )
+
+class ResourceVersion(db.Model):
+    # Счетчик версии набора данных (например, всех задач проекта) - дешевый валидатор для ETag
+    __tablename__ = 'resource_version'
+
+    scope = db.Column(db.String(32), primary_key=True)
+    object_id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class ProjectEvent(db.Model):
+    # Общая для всех воркеров лента изменений проектов (events.DatabaseBroker).
+    # AUTOINCREMENT: id не переиспользуются после очистки старых событий
+    __tablename__ = 'project_event'
+
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.Integer, nullable=False)
+    type = db.Column(db.String(32), nullable=False)
+    data = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = (
+        db.Index('ix_project_event_project_id', 'project_id', 'id'),
+        db.Index('ix_project_event_created_at', 'created_at'),
+        {'sqlite_autoincrement': True},
+    )
@@ -0,0 +1,62 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+class CursorError(ValueError):
+    pass
+
+def encode_cursor(*values):
+    # Курсор - непрозрачная для клиента строка с ключом последней строки страницы
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor, *types):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(payload, list) or len(payload) != len(types):
+            raise CursorError('Некорректный курсор')
+        values = []
+        for value, value_type in zip(payload, types):
+            if value is None:
+                values.append(None)
+            elif value_type is datetime:
+                values.append(datetime.fromisoformat(value))
+            else:
+                values.append(value_type(value))
+        return values
+    except CursorError:
+        raise
+    except Exception:
+        raise CursorError('Некорректный курсор')
+
+def keyset_after(columns, values, descending=False):
+    # (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y)
+    # Разворачиваем вручную, чтобы не зависеть от поддержки row values в СУБД
+    clauses = []
+    for i, (column, value) in enumerate(zip(columns, values)):
+        equal = [c == v for c, v in zip(columns[:i], values[:i])]
+        step = column < value if descending else column > value
+        clauses.append(and_(*equal, step))
+    return or_(*clauses)
+
+def keyset_page(query, columns, key, limit, cursor=None, descending=False, cursor_types=None):
+    # Возвращает (строки, следующий курсор); курсор None - страниц больше нет
+    if cursor:
+        values = decode_cursor(cursor, *(cursor_types or [datetime, int]))
+        query = query.filter(keyset_after(columns, values, descending))
+
+    order = [c.desc() for c in columns] if descending else [c.asc() for c in columns]
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(*key(rows[-1]))
+
+    return rows, next_cursor
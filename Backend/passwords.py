@@ -0,0 +1,109 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Хэширование паролей вне потоков, обслуживающих запросы.
+# Вычисление хэша намеренно медленное (scrypt/pbkdf2) и под пиком входов занимало бы все потоки
+# воркера. Хэши считаются в ограниченном пуле процессов (PASSWORD_HASH_WORKERS на воркер
+# gunicorn, 0 - в потоке запроса); одновременно принимается не больше PASSWORD_HASH_QUEUE задач
+# сверх размера пула, остальные сразу получают PasswordHashingBusy (ответ 503), а не ждут в очереди.
+# Параметры хэша задаются PASSWORD_HASH_METHOD; хэш со старыми параметрами пересчитывается
+# при успешном входе (см. verify_password)
+
+class PasswordHashingBusy(Exception):
+    pass
+
+def _method(password_hash):
+    # "scrypt:32768:8:1$соль$хэш" -> "scrypt:32768:8:1"
+    return password_hash.split('$', 1)[0]
+
+def _verify(password_hash, password, method, target):
+    # Выполняется в процессе пула: проверка и, если параметры устарели, новый хэш
+    if not check_password_hash(password_hash, password):
+        return False, None
+    if _method(password_hash) != target:
+        return True, generate_password_hash(password, method)
+    return True, None
+
+class PasswordHasher:
+    def __init__(self, method='scrypt', workers=1, queue=2, timeout=10):
+        self.configure(method, workers, queue, timeout)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def configure(self, method, workers, queue, timeout):
+        self.method = method
+        self.workers = workers
+        self.timeout = timeout
+        self._target = None
+        self._slots = threading.BoundedSemaphore(max(workers, 1) + queue)
+
+    @property
+    def target_method(self):
+        # Полная строка параметров (с подставленными значениями по умолчанию), с которой
+        # сравнивается сохраненный хэш
+        if self._target is None:
+            self._target = _method(self._run(generate_password_hash, '', self.method))
+        return self._target
+
+    def _executor(self):
+        # Пул создается при первом хэше - уже в воркере gunicorn, а не в мастере до fork.
+        # fork, а не spawn/forkserver: те заново импортируют главный модуль запущенного скрипта.
+        # Процессы пула выполняют только функции werkzeug и не трогают унаследованные соединения
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('fork'))
+            return self._pool
+
+    def _run(self, function, *args):
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            raise PasswordHashingBusy('Сервис перегружен, повторите попытку позже')
+        if self.workers <= 0:
+            try:
+                return function(*args)
+            finally:
+                slots.release()
+
+        try:
+            future = self._executor().submit(function, *args)
+        except Exception:
+            slots.release()
+            raise
+        # Место освобождается, когда процесс пула закончил работу, даже если запрос уже не ждет
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise PasswordHashingBusy('Сервис перегружен, повторите попытку позже')
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        # (пароль верен, новый хэш или None, если параметры хэша актуальны)
+        return self._run(_verify, password_hash, password, self.method, self.target_method)
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+hasher = PasswordHasher()
+
+def init_app(app):
+    hasher.shutdown()
+    hasher.configure(
+        app.config.get('PASSWORD_HASH_METHOD', 'scrypt'),
+        app.config.get('PASSWORD_HASH_WORKERS', 1),
+        app.config.get('PASSWORD_HASH_QUEUE', 2),
+        app.config.get('PASSWORD_HASH_TIMEOUT', 10),
+    )
+
+def hash_password(password):
+    return hasher.hash(password)
+
+def verify_password(password_hash, password):
+    return hasher.verify(password_hash, password)
@@ -0,0 +1,52 @@
+import hashlib
+from flask import current_app, request
+from cache import TTLCache
+
+# Справочные данные, которые загружает каждый клиент и которые редко меняются: перечисления,
+# справочник пользователей, отдельные пользователи. В кэше лежит уже сериализованный ответ
+# (байты JSON и ETag), поэтому попадание не обращается ни к БД, ни к marshmallow.
+# Изменения пользователей в этом процессе сбрасывают кэш сразу (invalidate_users),
+# в других воркерах - по истечении REFERENCE_CACHE_TTL
+
+reference_cache = TTLCache(maxsize=0, ttl=0, name='reference')
+
+ENUMS = 'enums'
+USERS = 'users'
+USER = 'user'
+
+def init_app(app):
+    reference_cache.maxsize = app.config.get('REFERENCE_CACHE_SIZE', 0)
+    reference_cache.ttl = app.config.get('REFERENCE_CACHE_TTL', 0)
+    reference_cache.clear()
+
+def _serialize(data):
+    body = current_app.json.dumps(data).encode()
+    return body, hashlib.sha1(body).hexdigest()
+
+def cached_json(key, build):
+    # build() -> данные ответа или None (не найдено; не кэшируется).
+    # Ответ 200 с ETag или 304, если у клиента та же версия
+    payload = reference_cache.get(key)
+    if payload is None:
+        data = build()
+        if data is None:
+            return None
+        payload = _serialize(data)
+        reference_cache.set(key, payload)
+
+    body, etag = payload
+    response = current_app.response_class(body, mimetype='application/json')
+    # Слабый ETag - тот же для сжатого ответа (см. conditional.py)
+    response.set_etag(etag, weak=True)
+    return response.make_conditional(request)
+
+def invalidate_users(user_id=None):
+    # Справочник (все его страницы и поиски) и карточка пользователя user_id; без user_id - все карточки
+    reference_cache.invalidate_where(lambda key: key[0] == USERS)
+    if user_id is None:
+        reference_cache.invalidate_where(lambda key: key[0] == USER)
+    else:
+        reference_cache.invalidate((USER, user_id))
+
+def invalidate_all():
+    reference_cache.invalidate_where(lambda key: True)
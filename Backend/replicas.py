@@ -0,0 +1,108 @@
+import itertools
+import os
+import time
+from flask import current_app, g, has_request_context, request
+from flask_jwt_extended import get_jwt_identity
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from cache import TTLCache
+from database import WRITE_METHODS, engine_options, is_sqlite_file, configure_sqlite
+
+# Маршрутизация чтения на реплики. Представления, помеченные replica_read, читают с реплик
+# (DATABASE_REPLICA_URLS), все остальное, включая любой flush, идет в основную БД.
+# Чтобы пользователь сразу видел свои изменения, после успешного запроса на запись его чтения
+# REPLICA_STICKY_SECONDS секунд идут в основную БД: в пределах процесса - по id пользователя,
+# между воркерами и узлами - по cookie с моментом окончания "прилипания"
+
+STICKY_COOKIE = 'db_primary_until'
+
+sticky_users = TTLCache(maxsize=0, ttl=0, name='replica_sticky_users')
+
+def replica_read(view):
+    # Представление только читает и допускает отставание реплики
+    view.replica_read = True
+    return view
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is not None or self._flushing or engine is not self._db.engines.get(None):
+            return engine
+        return _replica_engine() or engine
+
+def _replica_engine():
+    if not has_request_context():
+        return None
+    if '_replica_engine' not in g:
+        g._replica_engine = _choose_replica()
+    return g._replica_engine
+
+def _choose_replica():
+    state = current_app.extensions.get('replicas')
+    if not state or not state['engines'] or request.method in WRITE_METHODS:
+        return None
+    view = current_app.view_functions.get(request.endpoint)
+    if not getattr(view, 'replica_read', False) or _is_sticky():
+        return None
+    # Все запросы одного HTTP-запроса читают с одной реплики - данные согласованы между собой
+    return next(state['cycle'])
+
+def _current_user_id():
+    try:
+        return get_jwt_identity()
+    except RuntimeError:
+        # jwt_required для представления не вызывался
+        return None
+
+def _is_sticky():
+    try:
+        if float(request.cookies.get(STICKY_COOKIE, 0)) > time.time():
+            return True
+    except ValueError:
+        pass
+    user_id = _current_user_id()
+    return user_id is not None and sticky_users.get(str(user_id)) is not None
+
+def _mark_sticky(response):
+    state = current_app.extensions.get('replicas')
+    if not state or not state['engines'] or state['sticky_seconds'] <= 0:
+        return response
+    if request.method not in WRITE_METHODS or response.status_code >= 400:
+        return response
+    user_id = _current_user_id()
+    if user_id is not None:
+        sticky_users.set(str(user_id), True)
+    seconds = state['sticky_seconds']
+    response.set_cookie(STICKY_COOKIE, f'{time.time() + seconds:.3f}', max_age=seconds,
+                        httponly=True, samesite='Lax')
+    return response
+
+def create_replica_engine(app, url):
+    url = make_url(url)
+    if is_sqlite_file(url) and not os.path.isabs(url.database):
+        # Относительный путь - как у основной БД, от папки instance
+        url = url.set(database=os.path.join(app.instance_path, url.database))
+    engine = create_engine(url, **engine_options(url))
+    if is_sqlite_file(url):
+        configure_sqlite(engine)
+    return engine
+
+def init_app(app):
+    engines = [create_replica_engine(app, url) for url in app.config.get('SQLALCHEMY_REPLICA_URIS', [])]
+    sticky_seconds = app.config.get('REPLICA_STICKY_SECONDS', 5)
+    app.extensions['replicas'] = {
+        'engines': engines,
+        'cycle': itertools.cycle(engines),
+        'sticky_seconds': sticky_seconds,
+    }
+    sticky_users.maxsize = app.config.get('REPLICA_STICKY_USERS', 10000)
+    sticky_users.ttl = sticky_seconds
+    sticky_users.clear()
+    app.after_request(_mark_sticky)
+
+def dispose(close=True):
+    # После fork у воркера должны быть свои соединения (см. gunicorn.conf.py)
+    state = current_app.extensions.get('replicas') or {}
+    for engine in state.get('engines', []):
+        engine.dispose(close=close)
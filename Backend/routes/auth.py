@@ -1,7 +1,11 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import db, User
 from schemas import registration_schema, login_schema, user_schema
+from reference import invalidate_users
+from database import read_only_transaction
+from passwords import PasswordHashingBusy
+from tokens import issue_tokens, refresh_access_token, revoke_tokens, forget_user
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -11,34 +15,35 @@ def register():
         data = request.get_json()
         validated_data = registration_schema.load(data)
 
-        existing_user = User.query.filter_by(email=validated_data['email']).first()
-        if existing_user:
-            return jsonify({"error": "Email уже используется"}), 409
-
         user = User(
             username=validated_data['username'],
             email=validated_data['email'],
             role=validated_data['role']
         )
+        # Хэш считается до первого запроса к БД, чтобы не держать блокировку записи
         user.set_password(validated_data['password'])
 
+        existing_user = User.query.filter_by(email=validated_data['email']).first()
+        if existing_user:
+            return jsonify({"error": "Email уже используется"}), 409
+
         db.session.add(user)
         db.session.commit()
-
-        access_token = create_access_token(identity=str(user.id))
-        refresh_token = create_refresh_token(identity=str(user.id))
+        invalidate_users(user.id)
 
         return jsonify({
             "message": "Регистрация успешна",
             "user": user_schema.dump(user),
-            "access_token": access_token,
-            "refresh_token": refresh_token
+            **issue_tokens(user)
         }), 201
 
+    except PasswordHashingBusy as e:
+        return jsonify({"error": str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
 @auth_bp.route('/login', methods=['POST'])
+@read_only_transaction
 def login():
     try:
         data = request.get_json()
@@ -49,31 +54,35 @@ def login():
         if not user or not user.check_password(validated_data['password']):
             return jsonify({"error": "Неверный email или пароль"}), 401
 
-        access_token = create_access_token(identity=str(user.id))
-        refresh_token = create_refresh_token(identity=str(user.id))
+        if db.session.is_modified(user):
+            # Хэш пересчитан с текущими параметрами; не сохранился - обновится при следующем входе
+            try:
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
 
         return jsonify({
             "message": "Вход успешен",
             "user": user_schema.dump(user),
-            "access_token": access_token,
-            "refresh_token": refresh_token
+            **issue_tokens(user)
         }), 200
 
+    except PasswordHashingBusy as e:
+        return jsonify({"error": str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
 @auth_bp.route('/refresh', methods=['POST'])
 @jwt_required(refresh=True)
+@read_only_transaction
 def refresh():
+    # Версия refresh-токена уже проверена по кэшу (tokens.is_token_revoked), роль берется
+    # оттуда же - в обычном случае без запросов к БД
     try:
-        current_user_id = get_jwt_identity()
-
-        user = User.query.get(int(current_user_id))
-        if not user:
+        new_access_token = refresh_access_token(int(get_jwt_identity()))
+        if not new_access_token:
             return jsonify({"error": "Пользователь не найден"}), 401
 
-        new_access_token = create_access_token(identity=str(user.id))
-
         return jsonify({
             "message": "Токен обновлен",
             "access_token": new_access_token
@@ -81,3 +90,19 @@ def refresh():
 
     except Exception as e:
         return jsonify({"error": str(e)}), 400
+
+@auth_bp.route('/logout-all', methods=['POST'])
+@jwt_required()
+def logout_all():
+    # Отзыв всех выданных пользователю токенов (выход на всех устройствах)
+    try:
+        current_user_id = int(get_jwt_identity())
+        revoke_tokens(current_user_id)
+        db.session.commit()
+        forget_user(current_user_id)
+
+        return jsonify({"message": "Все сеансы завершены"}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
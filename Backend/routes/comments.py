@@ -1,55 +1,51 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, Comment, Task, Project
-from schemas import comment_schema, comments_schema
-from sqlalchemy import text
+from models import db, Comment, Task
+from schemas import comment_schema, comment_query_schema
+from pagination import DEFAULT_PAGE_SIZE, keyset_page
+import events
+from conditional import PROJECT, not_modified, touch
+from replicas import replica_read
+from serializers import comment_rows
+from access import get_current_user_role_in_project, check_task_access
 
 comments_bp = Blueprint('comments', __name__)
 
-def get_current_user_role_in_project(project_id, user_id):
-    project = Project.query.get(project_id)
-    if not project:
-        return None
-
-    if project.owner == user_id:
-        return 'Member'
-
-    stmt = text("""
-        SELECT role FROM project_users
-        WHERE project_id = :project_id AND user_id = :user_id
-    """)
-    result = db.session.execute(stmt, {
-        'project_id': project_id,
-        'user_id': user_id
-    }).fetchone()
-
-    return result[0] if result else None
-
-def check_task_access(task_id, user_id):
-    task = Task.query.get(task_id)
-    if not task:
-        return None, None
+@comments_bp.route('/tasks/<int:task_id>/comments', methods=['GET'])
+@jwt_required()
+@replica_read
+def get_comments(task_id):
+    try:
+        current_user_id = int(get_jwt_identity())
+        params = comment_query_schema.load(request.args)
 
-    role = get_current_user_role_in_project(task.project_id, user_id)
-    if role:
-        return task, role
+        task, role = check_task_access(task_id, current_user_id)
+        if not task:
+            return jsonify({"error": "Нет доступа к этой задаче"}), 403
 
-    if any(user.id == user_id for user in task.assignees):
-        return task, 'Assignee'
+        cached = not_modified(PROJECT, [task.project_id], current_user_id)
+        if cached:
+            return cached
 
-    return None, None
+        query = db.session.query(*comment_rows.columns).filter(Comment.task_id == task_id)
+        keyset = [Comment.creation_date, Comment.id]
 
-@comments_bp.route('/tasks/<int:task_id>/comments', methods=['GET'])
-@jwt_required()
-def get_comments(task_id):
-    current_user_id = int(get_jwt_identity())
+        # Новые сверху; страницами - если указан limit или cursor
+        if params.get('limit') or params.get('cursor'):
+            comments, next_cursor = keyset_page(
+                query, keyset,
+                key=lambda c: (c.creation_date, c.id),
+                limit=params.get('limit') or DEFAULT_PAGE_SIZE,
+                cursor=params.get('cursor'),
+                descending=True
+            )
+            return jsonify({"items": comment_rows.dump_many(comments), "next_cursor": next_cursor}), 200
 
-    task, role = check_task_access(task_id, current_user_id)
-    if not task:
-        return jsonify({"error": "Нет доступа к этой задаче"}), 403
+        comments = query.order_by(*[c.desc() for c in keyset]).all()
+        return comment_rows.dump_many(comments), 200
 
-    comments = Comment.query.filter_by(task_id=task_id).order_by(Comment.creation_date.desc()).all()
-    return comments_schema.dump(comments), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
 
 @comments_bp.route('/tasks/<int:task_id>/comments', methods=['POST'])
 @jwt_required()
@@ -63,15 +59,17 @@ def create_comment(task_id):
 
         data = request.get_json()
         data['task_id'] = task_id
-        data['author_id'] = current_user_id
 
         validated_data = comment_schema.load(data)
 
-        comment = Comment(**validated_data)
+        comment = Comment(**validated_data, author_id=current_user_id)
         db.session.add(comment)
+        touch(PROJECT, task.project_id)
         db.session.commit()
 
-        return comment_schema.dump(comment), 201
+        result = comment_schema.dump(comment)
+        events.publish(task.project_id, 'comment.created', result)
+        return result, 201
 
     except Exception as e:
         return jsonify({"error": str(e)}), 400
@@ -94,8 +92,13 @@ def update_comment(comment_id):
 
         comment.text_comment = validated_data.get('text_comment', comment.text_comment)
 
+        project_id = comment.task.project_id
+        touch(PROJECT, project_id)
         db.session.commit()
-        return comment_schema.dump(comment), 200
+
+        result = comment_schema.dump(comment)
+        events.publish(project_id, 'comment.updated', result)
+        return result, 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 400
@@ -129,8 +132,10 @@ def delete_comment(comment_id):
             return jsonify({"error": "Нет прав для удаления комментария"}), 403
 
         db.session.delete(comment)
+        touch(PROJECT, task.project_id)
         db.session.commit()
 
+        events.publish(task.project_id, 'comment.deleted', {"id": comment_id, "task_id": task.id})
         return jsonify({"message": "Комментарий удален"}), 200
 
     except Exception as e:
@@ -1,41 +1,32 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, Project, User, project_members
-from schemas import project_schema, projects_schema, project_member_schema
+from models import db, Project, ProjectRole, User, project_members
+from schemas import STATS_CHOICES, project_schema, project_member_schema, project_members_query_schema, MEMBER_FIELDS
+from pagination import DEFAULT_PAGE_SIZE, encode_cursor, decode_cursor
+import time
+import events
+from conditional import PROJECT, not_modified, touch
+from replicas import replica_read
+from serializers import project_rows
+from stats import project_stats
+from access import accessible_project_ids, get_current_user_role_in_project, invalidate_project_roles
 from sqlalchemy import text
 
 projects_bp = Blueprint('projects', __name__)
 
-def get_current_user_role_in_project(project_id, user_id):
-    project = Project.query.get(project_id)
-    if not project:
-        return None
-
-    if project.owner == user_id:
-        return 'Member'
-
-    stmt = text("""
-        SELECT role FROM project_users
-        WHERE project_id = :project_id AND user_id = :user_id
-    """)
-    result = db.session.execute(stmt, {
-        'project_id': project_id,
-        'user_id': user_id
-    }).fetchone()
-
-    return result[0] if result else None
-
 @projects_bp.route('', methods=['GET'])
 @jwt_required()
 def get_projects():
     current_user_id = int(get_jwt_identity())
 
-    user_projects = Project.query.filter(
-        (Project.owner == current_user_id) |
-        (Project.members.any(id=current_user_id))
-    ).all()
+    cached = not_modified(PROJECT, accessible_project_ids(current_user_id), current_user_id)
+    if cached:
+        return cached
 
-    return projects_schema.dump(user_projects), 200
+    rows = db.session.execute(
+        project_rows.select().where(Project.id.in_(accessible_project_ids(current_user_id)))
+    )
+    return project_rows.dump_many(rows), 200
 
 @projects_bp.route('', methods=['POST'])
 @jwt_required()
@@ -48,6 +39,8 @@ def create_project():
         validated_data = project_schema.load(data)
         project = Project(**validated_data)
         db.session.add(project)
+        db.session.flush()
+        touch(PROJECT, project.id)
         db.session.commit()
 
         return project_schema.dump(project), 201
@@ -64,12 +57,29 @@ def get_project(project_id):
     if not role:
         return jsonify({"error": "Нет доступа к проекту"}), 403
 
+    cached = not_modified(PROJECT, [project_id], current_user_id)
+    if cached:
+        return cached
+
     project = Project.query.get(project_id)
     if not project:
         return jsonify({"error": "Проект не найден"}), 404
 
     return project_schema.dump(project), 200
 
+@projects_bp.route('/<int:project_id>/stats', methods=['GET'])
+@jwt_required()
+@replica_read
+def get_project_stats(project_id):
+    current_user_id = int(get_jwt_identity())
+
+    role = get_current_user_role_in_project(project_id, current_user_id)
+    if not role:
+        return jsonify({"error": "Нет доступа к проекту"}), 403
+
+    # Без ETag: счетчики просроченных задач меняются со временем и без записей
+    return jsonify(project_stats(project_id, STATS_CHOICES)), 200
+
 @projects_bp.route('/<int:project_id>', methods=['PUT'])
 @jwt_required()
 def update_project(project_id):
@@ -90,8 +100,14 @@ def update_project(project_id):
         for key, value in validated_data.items():
             setattr(project, key, value)
 
+        touch(PROJECT, project_id)
         db.session.commit()
-        return project_schema.dump(project), 200
+        if 'owner' in validated_data:
+            invalidate_project_roles(project_id)
+
+        result = project_schema.dump(project)
+        events.publish(project_id, 'project.updated', result)
+        return result, 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 400
@@ -109,53 +125,79 @@ def delete_project(project_id):
         return jsonify({"error": "Только владелец может удалить проект"}), 403
 
     db.session.delete(project)
+    touch(PROJECT, project_id)
     db.session.commit()
+    invalidate_project_roles(project_id)
 
+    events.publish(project_id, 'project.deleted', {"id": project_id})
     return jsonify({"message": "Проект удален"}), 200
 
 @projects_bp.route('/<int:project_id>/members', methods=['GET'])
 @jwt_required()
+@replica_read
 def get_project_members(project_id):
-    current_user_id = int(get_jwt_identity())
-
-    role = get_current_user_role_in_project(project_id, current_user_id)
-    if not role:
-        return jsonify({"error": "Нет доступа к проекту"}), 403
-
-    project = Project.query.get(project_id)
-    if not project:
-        return jsonify({"error": "Проект не найден"}), 404
-
-    stmt = text("""
-        SELECT u.id, u.username, u.email, u.role as user_role, pu.role as project_role
-        FROM project_users pu
-        JOIN "user" u ON pu.user_id = u.id
-        WHERE pu.project_id = :project_id
-    """)
-    results = db.session.execute(stmt, {'project_id': project_id}).fetchall()
-
-    members = []
-    for row in results:
-        members.append({
-            'id': row[0],
-            'username': row[1],
-            'email': row[2],
-            'user_role': row[3],
-            'project_role': row[4]
-        })
-
-    if project.owner:
-        owner = User.query.get(project.owner)
-        if owner and not any(m['id'] == owner.id for m in members):
-            members.append({
-                'id': owner.id,
-                'username': owner.username,
-                'email': owner.email,
-                'user_role': owner.role,
-                'project_role': 'Member'
-            })
+    try:
+        current_user_id = int(get_jwt_identity())
+        params = project_members_query_schema.load(request.args)
+
+        paginated = bool(params.get('limit') or params.get('cursor'))
+        if paginated or request.if_none_match:
+            role = get_current_user_role_in_project(project_id, current_user_id)
+            if not role:
+                return jsonify({"error": "Нет доступа к проекту"}), 403
+
+        # Панель участников часто перезапрашивает список - без изменений отвечаем 304
+        cached = not_modified(PROJECT, [project_id], current_user_id)
+        if cached:
+            return cached
+
+        fields = params.get('projection') or MEMBER_FIELDS
+        columns = ', '.join(['id'] + [f for f in fields if f != 'id'])
+
+        # Участники и владелец с итоговыми ролями - одним запросом
+        sql = f"""
+            SELECT {columns} FROM (
+                SELECT u.id, u.username, u.email, u.role AS user_role,
+                       CASE WHEN u.id = p.owner THEN 'Member' ELSE pu.role END AS project_role
+                FROM project_users pu
+                JOIN project p ON p.id = pu.project_id
+                JOIN "user" u ON u.id = pu.user_id
+                WHERE pu.project_id = :project_id
+                UNION
+                SELECT u.id, u.username, u.email, u.role, 'Member'
+                FROM project p
+                JOIN "user" u ON u.id = p.owner
+                WHERE p.id = :project_id
+            ) AS members
+        """
+        values = {'project_id': project_id}
+        if params.get('cursor'):
+            sql += " WHERE id > :after"
+            values['after'] = decode_cursor(params['cursor'], int)[0]
+        sql += " ORDER BY id"
+        if paginated:
+            sql += " LIMIT :limit"
+            values['limit'] = (params.get('limit') or DEFAULT_PAGE_SIZE) + 1
+
+        rows = db.session.execute(text(sql), values).mappings().all()
+
+        if not paginated:
+            # Доступ есть ровно у тех, кто попал в список
+            if not any(row['id'] == current_user_id for row in rows):
+                return jsonify({"error": "Нет доступа к проекту"}), 403
+
+        next_cursor = None
+        if paginated and len(rows) > values['limit'] - 1:
+            rows = rows[:-1]
+            next_cursor = encode_cursor(rows[-1]['id'])
+
+        members = [{f: row[f] for f in fields} for row in rows]
+        if paginated:
+            return jsonify({"items": members, "next_cursor": next_cursor}), 200
+        return jsonify(members), 200
 
-    return jsonify(members), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
 
 @projects_bp.route('/<int:project_id>/members', methods=['POST'])
 @jwt_required()
@@ -200,7 +242,11 @@ def add_project_member(project_id):
             'role': validated_data['role']
         })
 
+        touch(PROJECT, project_id)
         db.session.commit()
+        invalidate_project_roles(project_id, validated_data['user_id'])
+
+        events.publish(project_id, 'member.added', {"user_id": validated_data['user_id'], "role": validated_data['role']})
         return jsonify({"message": "Участник добавлен"}), 200
 
     except Exception as e:
@@ -243,7 +289,7 @@ def update_project_member_role(project_id,user_id):
         validated_data = project_member_schema.load(data)
         new_role = validated_data['role']
 
-        valid_roles = ['Member', 'VIEWER']
+        valid_roles = [ProjectRole.Member.value, ProjectRole.VIEWER.value]
         if new_role not in valid_roles:
             return jsonify({"error": f"Некорректная роль. Допустимые: {', '.join(valid_roles)}"}), 400
 
@@ -261,11 +307,15 @@ def update_project_member_role(project_id,user_id):
             'new_role': new_role
         })
 
+        touch(PROJECT, project_id)
         db.session.commit()
+        invalidate_project_roles(project_id, user_id)
 
         if result.rowcount == 0:
             return jsonify({"error": "Не удалось обновить роль"}), 400
 
+        events.publish(project_id, 'member.updated', {"user_id": user_id, "role": new_role})
+
         return jsonify({
             "message": "Роль участника обновлена",
             "user_id": user_id,
@@ -305,12 +355,66 @@ def remove_project_member(project_id, user_id):
             'user_id': user_id
         })
 
+        touch(PROJECT, project_id)
         db.session.commit()
+        invalidate_project_roles(project_id, user_id)
 
         if result.rowcount == 0:
             return jsonify({"error": "Пользователь не найден в проекте"}), 404
 
+        events.publish(project_id, 'member.removed', {"user_id": user_id})
         return jsonify({"message": "Участник удален из проекта"}), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 400
+
+@projects_bp.route('/<int:project_id>/events', methods=['GET'])
+@jwt_required()
+def get_project_events(project_id):
+    current_user_id = int(get_jwt_identity())
+
+    role = get_current_user_role_in_project(project_id, current_user_id)
+    if not role:
+        return jsonify({"error": "Нет доступа к проекту"}), 403
+
+    # Чужой или устаревший Last-Event-ID брокер не примет - клиент получит reset
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id') \
+        or events.broker.last_id(project_id)
+
+    heartbeat = current_app.config['EVENTS_HEARTBEAT_SECONDS']
+    max_age = current_app.config['EVENTS_MAX_STREAM_SECONDS']
+    # Лента держит поток сервера - их число на процесс ограничено, остальные потоки для запросов
+    if not events.open_stream():
+        return jsonify({"error": "Слишком много открытых лент событий"}), 503, {'Retry-After': str(heartbeat)}
+    dumps = current_app.json.dumps
+
+    # Генератор не трогает БД: сессия закрывается сразу после выхода из view,
+    # а долгое соединение не держит подключение из пула
+    def generate():
+        nonlocal last_id
+        yield f"retry: {heartbeat * 1000}\n\n"
+        started = time.monotonic()
+        while time.monotonic() - started < max_age:
+            batch, complete = events.broker.wait(project_id, last_id, heartbeat)
+            if not complete:
+                # Пропущенных событий уже нет в буфере - клиент должен перезагрузить данные целиком
+                last_id = events.broker.last_id(project_id)
+                yield f"id: {last_id}\nevent: reset\ndata: {{}}\n\n"
+                continue
+            if not batch:
+                yield ": keepalive\n\n"
+                continue
+            for event in batch:
+                last_id = event['id']
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {dumps(event['data'])}\n\n"
+                if event['type'] == 'project.deleted':
+                    return
+                if event['type'] == 'member.removed' and event['data']['user_id'] == current_user_id:
+                    return
+
+    response = Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    response.call_on_close(events.close_stream)
+    return response
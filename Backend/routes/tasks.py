@@ -1,54 +1,39 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, Task, User, Project
-from schemas import task_schema, tasks_schema, task_assignee_schema, task_filter_schema
-from sqlalchemy import text
+from models import db, Task, Comment, task_assigneess
+from schemas import task_schema, tasks_schema, task_updates_schema, task_batch_schema, task_assignee_schema, task_filter_schema, task_search_schema, task_tree_schema, due_tasks_query_schema
+from access import accessible_project_ids, get_current_user_role_in_project, get_roles_in_projects, check_task_access
+from assignees import set_task_assignees, sync_assignees
+import deadlines
+import events
+from conditional import PROJECT, not_modified, touch
+from replicas import replica_read
+from serializers import task_rows
+from task_tree import MAX_TREE_DEPTH, subtree_ids, cyclic_moves, load_tree, build_tree
+from search import task_match_ids, task_hits
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_after, keyset_page, decode_cursor
+from marshmallow import ValidationError
+from sqlalchemy import select, insert, update, delete, func
+from datetime import datetime, timedelta
+
+STREAM_BATCH_SIZE = 500
+DUE_DEFAULT_DAYS = 7
+# Роли, которым разрешено изменять задачу; остальные (Viewer) - только чтение
+EDIT_ROLES = ('Member', 'Assignee')
 
 tasks_bp = Blueprint('tasks', __name__)
 
-def get_current_user_role_in_project(project_id, user_id):
-    project = Project.query.get(project_id)
-    if not project:
-        return None
-
-    if project.owner == user_id:
-        return 'Member'
-
-    stmt = text("""
-        SELECT role FROM project_users
-        WHERE project_id = :project_id AND user_id = :user_id
-    """)
-    result = db.session.execute(stmt, {
-        'project_id': project_id,
-        'user_id': user_id
-    }).fetchone()
-
-    return result[0] if result else None
-
-def check_task_access(task_id, user_id):
-    task = Task.query.get(task_id)
-    if not task:
-        return None, None
-
-    role = get_current_user_role_in_project(task.project_id, user_id)
-    if role:
-        return task, role
-
-    if any(user.id == user_id for user in task.assignees):
-        return task, 'Assignee'
-
-    return None, None
-
 @tasks_bp.route('', methods=['GET'])
 @jwt_required()
+@replica_read
 def get_tasks():
     try:
         current_user_id = int(get_jwt_identity())
         filters = task_filter_schema.load(request.args)
 
-        query = Task.query.join(Project).filter(
-            (Project.owner == current_user_id) |
-            (Project.members.any(id=current_user_id))
+        # Строки с колонками схемы, без ORM-объектов (см. serializers.py)
+        query = db.session.query(*task_rows.columns).filter(
+            Task.project_id.in_(accessible_project_ids(current_user_id))
         )
 
         if filters.get('project_id'):
@@ -57,24 +42,201 @@ def get_tasks():
                 return jsonify({"error": "Нет доступа к этому проекту"}), 403
             query = query.filter(Task.project_id == filters['project_id'])
 
+        cached = not_modified(PROJECT, [filters['project_id']] if filters.get('project_id')
+                              else accessible_project_ids(current_user_id), current_user_id)
+        if cached:
+            return cached
+
         if filters.get('priority'):
-            query = query.filter_by(priority=filters['priority'])
+            query = query.filter(Task.priority == filters['priority'])
         if filters.get('category'):
-            query = query.filter_by(category=filters['category'])
+            query = query.filter(Task.category == filters['category'])
         if filters.get('status'):
-            query = query.filter_by(status=filters['status'])
+            query = query.filter(Task.status == filters['status'])
         if filters.get('assignee_id'):
-            query = query.filter(Task.assignees.any(id=filters['assignee_id']))
+            query = query.filter(Task.id.in_(
+                select(task_assigneess.c.task_id).where(task_assigneess.c.user_id == filters['assignee_id'])
+            ))
         if filters.get('search'):
-            search = f"%{filters['search']}%"
-            query = query.filter(Task.title.ilike(search) | Task.description.ilike(search))
+            query = query.filter(Task.id.in_(task_match_ids(filters['search'])))
+
+        include = filters.get('include') or []
+        if 'comment_count' in include:
+            query = query.add_columns(comment_count_column())
+        dump = task_dumper(include)
+
+        keyset = [Task.creation_date, Task.id]
+
+        if filters.get('format') == 'ndjson':
+            return stream_tasks(query, keyset, filters, dump)
+
+        if filters.get('limit') or filters.get('cursor'):
+            tasks, next_cursor = keyset_page(
+                query, keyset,
+                key=lambda t: (t.creation_date, t.id),
+                limit=filters.get('limit') or DEFAULT_PAGE_SIZE,
+                cursor=filters.get('cursor')
+            )
+            return jsonify({"items": list(map(dump, tasks)), "next_cursor": next_cursor}), 200
+
+        # Старый формат (массив без курсора) устарел: отдается не больше MAX_PAGE_SIZE задач,
+        # курсор продолжения - в заголовке X-Next-Cursor
+        tasks, next_cursor = keyset_page(
+            query, keyset,
+            key=lambda t: (t.creation_date, t.id),
+            limit=MAX_PAGE_SIZE
+        )
+        headers = {'Deprecation': 'true'}
+        if next_cursor:
+            headers['X-Next-Cursor'] = next_cursor
+        return list(map(dump, tasks)), 200, headers
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@tasks_bp.route('/search', methods=['GET'])
+@jwt_required()
+def search_tasks():
+    try:
+        current_user_id = int(get_jwt_identity())
+        params = task_search_schema.load(request.args)
+
+        hits = task_hits(params['q'], include_comments=params['comments'])
+        query = db.session.query(*task_rows.columns, hits.c.rank).join(hits, hits.c.task_id == Task.id).filter(
+            Task.project_id.in_(accessible_project_ids(current_user_id))
+        )
+
+        if params.get('project_id'):
+            role = get_current_user_role_in_project(params['project_id'], current_user_id)
+            if not role:
+                return jsonify({"error": "Нет доступа к этому проекту"}), 403
+            query = query.filter(Task.project_id == params['project_id'])
+
+        cached = not_modified(PROJECT, [params['project_id']] if params.get('project_id')
+                              else accessible_project_ids(current_user_id), current_user_id)
+        if cached:
+            return cached
+
+        rows = query.order_by(hits.c.rank, Task.id).limit(params['limit']).all()
+        return jsonify([dict(task_rows.dump(row), rank=row.rank) for row in rows]), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@tasks_bp.route('/due', methods=['GET'])
+@jwt_required()
+@replica_read
+def get_due_tasks():
+    try:
+        current_user_id = int(get_jwt_identity())
+        params = due_tasks_query_schema.load(request.args)
+
+        if params.get('project_id'):
+            role = get_current_user_role_in_project(params['project_id'], current_user_id)
+            if not role:
+                return jsonify({"error": "Нет доступа к этому проекту"}), 403
+
+        now = datetime.now()
+        if params['overdue']:
+            start, end, include_done = None, now, False
+        else:
+            start = params.get('start') or now
+            end = params.get('end') or start + timedelta(days=DUE_DEFAULT_DAYS)
+            include_done = params['include_done']
+
+        tasks, next_cursor = deadlines.due_tasks(
+            current_user_id, start, end,
+            project_id=params.get('project_id'),
+            include_done=include_done,
+            limit=params.get('limit') or DEFAULT_PAGE_SIZE,
+            cursor=params.get('cursor')
+        )
+        return jsonify({"items": list(map(task_rows.dump, tasks)), "next_cursor": next_cursor}), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@tasks_bp.route('/tree', methods=['GET'])
+@jwt_required()
+def get_project_tree():
+    try:
+        current_user_id = int(get_jwt_identity())
+        params = task_tree_schema.load(request.args)
 
-        tasks = query.all()
-        return tasks_schema.dump(tasks), 200
+        project_id = params.get('project_id')
+        if not project_id:
+            return jsonify({"error": "Не указан project_id"}), 400
+
+        role = get_current_user_role_in_project(project_id, current_user_id)
+        if not role:
+            return jsonify({"error": "Нет доступа к этому проекту"}), 403
+
+        cached = not_modified(PROJECT, [project_id], current_user_id)
+        if cached:
+            return cached
+
+        roots = select(Task.id).where(Task.project_id == project_id, Task.parent_id.is_(None))
+        return jsonify(tree_response(roots, params)), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@tasks_bp.route('/<int:task_id>/tree', methods=['GET'])
+@jwt_required()
+def get_task_tree(task_id):
+    try:
+        current_user_id = int(get_jwt_identity())
+        params = task_tree_schema.load(request.args)
+
+        task, role = check_task_access(task_id, current_user_id)
+        if not task:
+            return jsonify({"error": "Нет доступа к этой задаче"}), 403
+
+        cached = not_modified(PROJECT, [task.project_id], current_user_id)
+        if cached:
+            return cached
+
+        return jsonify(tree_response([task_id], params)[0]), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+def tree_response(roots, params):
+    # Для rollups нужно все поддерево, иначе глубину ограничивает сам рекурсивный запрос
+    depth = params.get('depth')
+    max_depth = MAX_TREE_DEPTH if params['rollups'] or depth is None else depth
+    rows = load_tree(roots, max_depth)
+    return build_tree(rows, task_schema.dump, depth=depth, rollups=params['rollups'])
+
+def comment_count_column():
+    # Коррелированный подзапрос: для каждой выбранной задачи - count по индексу comment(task_id, ...),
+    # без группировки всей таблицы комментариев
+    return select(func.count(Comment.id)).where(
+        Comment.task_id == Task.id
+    ).correlate(Task).scalar_subquery().label('comment_count')
+
+def task_dumper(include):
+    # Колонки из include идут в строке после колонок схемы
+    if not include:
+        return task_rows.dump
+    return lambda row: dict(task_rows.dump(row), **{name: getattr(row, name) for name in include})
+
+def stream_tasks(query, keyset, filters, dump):
+    # NDJSON: по одной задаче на строку, строки читаются из курсора БД пачками,
+    # поэтому память воркера не растет вместе с размером проекта
+    if filters.get('cursor'):
+        query = query.filter(keyset_after(keyset, decode_cursor(filters['cursor'], datetime, int)))
+    query = query.order_by(*keyset)
+    if filters.get('limit'):
+        query = query.limit(filters['limit'])
+
+    def generate():
+        dumps = current_app.json.dumps
+        for row in query.yield_per(STREAM_BATCH_SIZE):
+            yield dumps(dump(row)) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @tasks_bp.route('', methods=['POST'])
 @jwt_required()
 def create_task():
@@ -98,15 +260,14 @@ def create_task():
         db.session.flush()
 
         if 'assignee_ids' in validated_data:
-            assignee_ids = validated_data['assignee_ids']
-
-            for user_id in assignee_ids:
-                user = User.query.get(user_id)
-                if user:
-                    task.assignees.append(user)
+            set_task_assignees(task, validated_data['assignee_ids'])
+        touch(PROJECT, task.project_id)
         db.session.commit()
 
-        return task_schema.dump(task), 201
+        result = task_schema.dump(task)
+        deadlines.schedule([task])
+        events.publish(task.project_id, 'task.created', result)
+        return result, 201
 
     except Exception as e:
         db.session.rollback()
@@ -125,6 +286,10 @@ def get_task(task_id):
     if not task:
         return jsonify({"error": "Нет доступа к этой задаче"}), 403
 
+    cached = not_modified(PROJECT, [task.project_id], current_user_id)
+    if cached:
+        return cached
+
     return task_schema.dump(task), 200
 
 @tasks_bp.route('/<int:task_id>', methods=['PUT'])
@@ -137,11 +302,16 @@ def update_task(task_id):
         if not task:
             return jsonify({"error": "Нет доступа к этой задаче"}), 403
 
-        if role == 'VIEWER':
+        if role not in EDIT_ROLES:
             return jsonify({"error": "Наблюдатель не может изменять задачи"}), 403
 
         data = request.get_json()
         validated_data = task_schema.load(data, partial=True)
+        old_project_id = task.project_id
+
+        parent_id = validated_data.get('parent_id')
+        if parent_id is not None and parent_id in subtree_ids([task_id]):
+            return jsonify({"error": "Задачу нельзя вложить в саму себя или в ее подзадачу"}), 400
 
         for key, value in validated_data.items():
             if key != 'assignee_ids':
@@ -151,16 +321,21 @@ def update_task(task_id):
             if role != 'Member':
                 return jsonify({"error": "Только Member может менять исполнителей"}), 403
 
+            set_task_assignees(task, validated_data['assignee_ids'])
 
-            task.assignees = []
-
-            for user_id in validated_data['assignee_ids']:
-                user = User.query.get(user_id)
-                if user:
-                    task.assignees.append(user)
-
+        touch(PROJECT, old_project_id, task.project_id)
         db.session.commit()
-        return task_schema.dump(task), 200
+
+        result = task_schema.dump(task)
+        deadlines.schedule([task])
+        if old_project_id != task.project_id:
+            events.publish(old_project_id, 'task.deleted', {"id": task_id})
+            events.publish(task.project_id, 'task.created', result)
+        else:
+            events.publish(task.project_id, 'task.updated', result)
+        if 'assignee_ids' in validated_data:
+            events.publish(task.project_id, 'task.assignees', {"id": task_id, "user_ids": validated_data['assignee_ids']})
+        return result, 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 400
@@ -178,8 +353,13 @@ def delete_task(task_id):
         return jsonify({"error": "Требуются права Member для удаления задач"}), 403
 
     db.session.delete(task)
+    touch(PROJECT, task.project_id)
     db.session.commit()
 
+    # Подзадачи удаляются вместе с задачей, отдельных событий для них нет;
+    # их записи в планировщике дедлайнов отбросит проверка перед публикацией
+    deadlines.unschedule([task_id])
+    events.publish(task.project_id, 'task.deleted', {"id": task_id})
     return jsonify({"message": "Задача удалена"}), 200
 
 @tasks_bp.route('/<int:task_id>/assignees', methods=['POST'])
@@ -198,14 +378,209 @@ def assign_task(task_id):
         data = request.get_json()
         validated_data = task_assignee_schema.load(data)
 
-        task.assignees = []
-        for user_id in validated_data['user_ids']:
-            user = User.query.get(user_id)
-            if user:
-                task.assignees.append(user)
+        set_task_assignees(task, validated_data['user_ids'])
 
+        touch(PROJECT, task.project_id)
         db.session.commit()
+
+        events.publish(task.project_id, 'task.assignees', {"id": task_id, "user_ids": validated_data['user_ids']})
         return jsonify({"message": "Исполнители назначены"}), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 400
+
+@tasks_bp.route('/batch', methods=['POST'])
+@jwt_required()
+def batch_tasks():
+    try:
+        current_user_id = int(get_jwt_identity())
+        batch = task_batch_schema.load(request.get_json())
+        operations = batch['operations']
+        results = [None] * len(operations)
+
+        def fail(index, status, error, details=None):
+            results[index] = {"index": index, "status": status, "error": error}
+            if details:
+                results[index]["details"] = details
+
+        creates = [(i, op.get('data') or {}) for i, op in enumerate(operations) if op['op'] == 'create']
+        updates = [(i, op) for i, op in enumerate(operations) if op['op'] == 'update']
+        deletes = [(i, op) for i, op in enumerate(operations) if op['op'] == 'delete']
+
+        # Задачи, которые меняются или удаляются, - одним запросом
+        target_ids = {op.get('id') for i, op in updates + deletes if op.get('id')}
+        targets = {}
+        if target_ids:
+            targets = dict(db.session.execute(
+                select(Task.id, Task.project_id).where(Task.id.in_(target_ids))
+            ).all())
+
+        for i, op in updates + deletes:
+            if not op.get('id'):
+                fail(i, 400, "Не указан id задачи")
+            elif op['id'] not in targets:
+                fail(i, 404, "Задача не найдена")
+
+        create_data = load_batch(tasks_schema, creates, fail)
+        update_data = load_batch(task_updates_schema,
+                                 [(i, op.get('data') or {}) for i, op in updates if results[i] is None], fail)
+        update_ids = {i: operations[i]['id'] for i, data in update_data}
+        delete_ids = {i: op['id'] for i, op in deletes if results[i] is None}
+
+        # Права проверяются один раз на каждый затронутый проект
+        project_ids = {data['project_id'] for i, data in create_data}
+        project_ids |= {targets[task_id] for task_id in list(update_ids.values()) + list(delete_ids.values())}
+        project_ids |= {data['project_id'] for i, data in update_data if data.get('project_id')}
+        roles = get_roles_in_projects(project_ids, current_user_id)
+
+        without_role = [task_id for task_id in update_ids.values() if not roles.get(targets[task_id])]
+        assigned = set()
+        if without_role:
+            assigned = set(db.session.scalars(
+                select(task_assigneess.c.task_id).where(
+                    task_assigneess.c.user_id == current_user_id,
+                    task_assigneess.c.task_id.in_(without_role)
+                )
+            ))
+
+        for i, data in create_data:
+            if roles.get(data['project_id']) != 'Member':
+                fail(i, 403, "Требуются права Member для создания задач")
+
+        for i, data in update_data:
+            task_id = update_ids[i]
+            role = roles.get(targets[task_id]) or ('Assignee' if task_id in assigned else None)
+            if not role:
+                fail(i, 403, "Нет доступа к этой задаче")
+            elif role not in EDIT_ROLES:
+                fail(i, 403, "Наблюдатель не может изменять задачи")
+            elif 'assignee_ids' in data and role != 'Member':
+                fail(i, 403, "Только Member может менять исполнителей")
+            elif data.get('project_id') and roles.get(data['project_id']) != 'Member':
+                fail(i, 403, "Нет доступа к проекту назначения")
+
+        for i, task_id in delete_ids.items():
+            if roles.get(targets[task_id]) != 'Member':
+                fail(i, 403, "Требуются права Member для удаления задач")
+
+        # Удаляемые поддеревья считаются до записи: задачи из них нельзя менять в том же пакете,
+        # и новые или перенесенные задачи не могут оказаться внутри них
+        removed = subtree_ids([task_id for i, task_id in delete_ids.items() if results[i] is None])
+        for i, data in create_data:
+            if results[i] is None and data.get('parent_id') in removed:
+                fail(i, 400, "Родительская задача удаляется в этом же пакете")
+        for i, data in update_data:
+            if results[i] is not None:
+                continue
+            if update_ids[i] in removed:
+                fail(i, 400, "Задача удаляется в этом же пакете")
+            elif data.get('parent_id') in removed:
+                fail(i, 400, "Родительская задача удаляется в этом же пакете")
+
+        # Переносы проверяются на циклы вместе, в порядке операций пакета
+        moves = [(i, update_ids[i], data['parent_id']) for i, data in update_data
+                 if results[i] is None and 'parent_id' in data]
+        for n in cyclic_moves([(task_id, parent_id) for i, task_id, parent_id in moves]):
+            fail(moves[n][0], 400, "Задачу нельзя вложить в саму себя или в ее подзадачу")
+
+        if batch['atomic'] and any(results):
+            return jsonify({"error": "Пакет отклонен", "results": [r for r in results if r]}), 400
+
+        create_data = [(i, data) for i, data in create_data if results[i] is None]
+        update_data = [(i, data) for i, data in update_data if results[i] is None]
+        delete_ids = {i: task_id for i, task_id in delete_ids.items() if results[i] is None}
+
+        # Все изменения - одной транзакцией, пакетными INSERT/UPDATE/DELETE
+        assignments = {}
+        created_ids = {}
+        if create_data:
+            rows = [{k: v for k, v in data.items() if k != 'assignee_ids'} for i, data in create_data]
+            new_ids = db.session.scalars(
+                insert(Task).returning(Task.id, sort_by_parameter_order=True), rows
+            ).all()
+            for (i, data), task_id in zip(create_data, new_ids):
+                created_ids[i] = task_id
+                if 'assignee_ids' in data:
+                    assignments[task_id] = data['assignee_ids']
+
+        rows = []
+        for i, data in update_data:
+            task_id = update_ids[i]
+            fields = {k: v for k, v in data.items() if k != 'assignee_ids'}
+            if fields:
+                rows.append({'id': task_id, **fields})
+            if 'assignee_ids' in data:
+                assignments[task_id] = data['assignee_ids']
+        if rows:
+            db.session.execute(update(Task), rows)
+
+        sync_assignees(assignments)
+
+        if removed:
+            db.session.execute(delete(Comment).where(Comment.task_id.in_(removed)),
+                               execution_options={'synchronize_session': False})
+            db.session.execute(task_assigneess.delete().where(task_assigneess.c.task_id.in_(removed)))
+            db.session.execute(delete(Task).where(Task.id.in_(removed)),
+                               execution_options={'synchronize_session': False})
+
+        touch(PROJECT, *project_ids)
+        db.session.commit()
+
+    except Exception as e:
+        db.session.rollback()
+
+        if hasattr(e, 'messages'):
+            return jsonify({"error": "Ошибка валидации", "details": e.messages}), 400
+
+        return jsonify({"error": str(e)}), 400
+
+    # Изменения уже записаны - ниже только ответ, события и планировщик дедлайнов.
+    # Задачи, удаленные после commit параллельным запросом, отвечают одним id
+    changed = list(created_ids.values()) + [update_ids[i] for i, data in update_data]
+    tasks = {}
+    if changed:
+        tasks = {t.id: t for t in Task.query.filter(Task.id.in_(changed)).populate_existing()}
+
+    created = [(i, tasks.get(task_id)) for i, task_id in created_ids.items()]
+    updated = [(i, tasks.get(update_ids[i])) for i, data in update_data]
+    for i, task in created:
+        results[i] = {"index": i, "status": 201, "task": task_schema.dump(task)} if task \
+            else {"index": i, "status": 201, "id": created_ids[i]}
+    for i, task in updated:
+        results[i] = {"index": i, "status": 200, "task": task_schema.dump(task)} if task \
+            else {"index": i, "status": 200, "id": update_ids[i]}
+    for i, task_id in delete_ids.items():
+        results[i] = {"index": i, "status": 200, "id": task_id}
+
+    deadlines.schedule(tasks.values())
+    deadlines.unschedule(removed)
+
+    for i, task in created:
+        if task:
+            events.publish(task.project_id, 'task.created', results[i]['task'])
+    for i, task in updated:
+        if task:
+            events.publish(task.project_id, 'task.updated', results[i]['task'])
+    for i, task_id in delete_ids.items():
+        events.publish(targets[task_id], 'task.deleted', {"id": task_id})
+
+    return jsonify({"results": results}), 200
+
+def load_batch(schema, items, fail):
+    # Валидация всех элементов одним вызовом schema(many=True); ошибки раздаются по позициям
+    if not items:
+        return []
+    try:
+        loaded = schema.load([data for i, data in items])
+        errors = {}
+    except ValidationError as e:
+        loaded = e.valid_data
+        errors = e.messages
+
+    valid = []
+    for position, (i, data) in enumerate(items):
+        if position in errors:
+            fail(i, 400, "Ошибка валидации", errors[position])
+        else:
+            valid.append((i, loaded[position]))
+    return valid
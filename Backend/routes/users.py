@@ -1,18 +1,51 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import User
-from schemas import users_schema, user_schema
+from schemas import users_schema, user_schema, user_directory_query_schema, USER_FIELDS
+from reference import USERS, USER, cached_json
+from replicas import replica_read
+from access import get_current_user_role_in_project
+from directory import list_users, search_users, project_users
 
 users_bp = Blueprint('users', __name__)
 
 @users_bp.route('', methods=['GET'])
+@jwt_required()
+@replica_read
 def get_users():
-    users = User.query.all()
-    return users_schema.dump(users), 200
+    # Справочник содержит email - только для вошедших пользователей.
+    # Без параметров - весь справочник, как раньше; с параметрами - страница
+    # {"items": [...], "next_cursor": ...}: ?q=префикс, ?project_id=, ?limit=, ?cursor=, ?fields=
+    try:
+        if not request.args:
+            return cached_json((USERS,), lambda: users_schema.dump(User.query.all()))
+
+        params = user_directory_query_schema.load(request.args)
+        fields = params.get('projection') or USER_FIELDS
+        page = dict(limit=params.get('limit'), cursor=params.get('cursor'))
+
+        project_id = params.get('project_id')
+        if project_id is not None:
+            if not get_current_user_role_in_project(project_id, int(get_jwt_identity())):
+                return jsonify({"error": "Нет доступа к проекту"}), 403
+            return jsonify(project_users(project_id, fields, params.get('q'), **page)), 200
+
+        key = (USERS,) + tuple(sorted(request.args.items(multi=True)))
+        if params.get('q'):
+            return cached_json(key, lambda: search_users(params['q'], fields, **page))
+        return cached_json(key, lambda: list_users(fields, **page))
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
 
 @users_bp.route('/<int:user_id>', methods=['GET'])
+@jwt_required()
 def get_user(user_id):
-    user = User.query.get(user_id)
-    if not user:
-        return jsonify({"error": "Пользователь не найден"}), 404
+    def build():
+        user = User.query.get(user_id)
+        return user_schema.dump(user) if user else None
 
-    return user_schema.dump(user), 200
+    response = cached_json((USER, user_id), build)
+    if response is None:
+        return jsonify({"error": "Пользователь не найден"}), 404
+    return response
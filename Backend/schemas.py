@@ -1,6 +1,8 @@
 from marshmallow import Schema, fields, validate, validates, ValidationError
 from datetime import datetime
 from models import UserRole, ProjectRole, TaskPriority, TaskCategory, TaskStatus, Color
+from pagination import MAX_PAGE_SIZE
+from task_tree import MAX_TREE_DEPTH
 
 USER_ROLES = [role.value for role in UserRole]
 PROJECT_ROLES = [role.value for role in ProjectRole]
@@ -8,6 +10,13 @@ TASK_PRIORITIES = [priority.value for priority in TaskPriority]
 TASK_CATEGORIES = [category.value for category in TaskCategory]
 TASK_STATUSES = [status.value for status in TaskStatus]
 COLORS = [color.value for color in Color]
+TASK_BATCH_OPERATIONS = ['create', 'update', 'delete']
+MEMBER_FIELDS = ['id', 'username', 'email', 'user_role', 'project_role']
+USER_FIELDS = ['id', 'username', 'email', 'role']
+TASK_INCLUDES = ['comment_count']
+MAX_BATCH_SIZE = 1000
+# Значения измерений сводки по проекту
+STATS_CHOICES = {'status': TASK_STATUSES, 'priority': TASK_PRIORITIES, 'category': TASK_CATEGORIES}
 
 def validate_deadline_not_past(value):
     if value == None:
@@ -45,6 +54,16 @@ class TaskSchema(Schema):
     parent_id = fields.Int(allow_none=True)
     assignee_ids = fields.List(fields.Int(), load_only=True, required=False)
 
+class TaskOperationSchema(Schema):
+    op = fields.Str(required=True, validate=validate.OneOf(TASK_BATCH_OPERATIONS))
+    id = fields.Int(allow_none=True)
+    data = fields.Dict(allow_none=True)
+
+class TaskBatchSchema(Schema):
+    operations = fields.List(fields.Nested(TaskOperationSchema), required=True,
+                             validate=validate.Length(min=1, max=MAX_BATCH_SIZE))
+    atomic = fields.Bool(load_default=False)
+
 class CommentSchema(Schema):
     id = fields.Int(dump_only=True)
     text_comment = fields.Str(required=True, validate=validate.Length(min=1))
@@ -56,6 +75,31 @@ class ProjectMemberSchema(Schema):
     user_id = fields.Int(required=True)
     role = fields.Str(required=True, validate=validate.OneOf(PROJECT_ROLES))
 
+class FieldList(fields.Str):
+    # Список полей через запятую: ?fields=id,username
+    def __init__(self, choices, **kwargs):
+        super().__init__(**kwargs)
+        self.choices = choices
+
+    def _deserialize(self, value, attr, data, **kwargs):
+        names = [name.strip() for name in super()._deserialize(value, attr, data, **kwargs).split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.choices]
+        if unknown:
+            raise ValidationError(f"Неизвестные поля: {', '.join(unknown)}")
+        return names
+
+class ProjectMembersQuerySchema(Schema):
+    limit = fields.Int(allow_none=True, validate=validate.Range(min=1, max=MAX_PAGE_SIZE))
+    cursor = fields.Str(allow_none=True)
+    projection = FieldList(MEMBER_FIELDS, allow_none=True, data_key='fields')
+
+class UserDirectoryQuerySchema(Schema):
+    q = fields.Str(allow_none=True, validate=validate.Length(min=1, max=128))
+    project_id = fields.Int(allow_none=True)
+    limit = fields.Int(allow_none=True, validate=validate.Range(min=1, max=MAX_PAGE_SIZE))
+    cursor = fields.Str(allow_none=True)
+    projection = FieldList(USER_FIELDS, allow_none=True, data_key='fields')
+
 class TaskAssigneeSchema(Schema):
     user_ids = fields.List(fields.Int(), required=True)
 
@@ -83,6 +127,42 @@ class TaskFilterSchema(Schema):
     status = fields.Str(allow_none=True, validate=validate.OneOf(TASK_STATUSES))
     assignee_id = fields.Int(allow_none=True)
     search = fields.Str(allow_none=True)
+    limit = fields.Int(allow_none=True, validate=validate.Range(min=1, max=MAX_PAGE_SIZE))
+    cursor = fields.Str(allow_none=True)
+    format = fields.Str(allow_none=True, validate=validate.OneOf(['json', 'ndjson']))
+    include = FieldList(TASK_INCLUDES, allow_none=True)
+
+class CommentQuerySchema(Schema):
+    limit = fields.Int(allow_none=True, validate=validate.Range(min=1, max=MAX_PAGE_SIZE))
+    cursor = fields.Str(allow_none=True)
+
+class DbStatsQuerySchema(Schema):
+    sizes = fields.Bool(load_default=False)
+
+class TableSampleSchema(Schema):
+    limit = fields.Int(load_default=50, validate=validate.Range(min=1, max=MAX_PAGE_SIZE))
+    cursor = fields.Str(allow_none=True)
+
+class TaskSearchSchema(Schema):
+    q = fields.Str(required=True, validate=validate.Length(min=1, max=256))
+    project_id = fields.Int(allow_none=True)
+    comments = fields.Bool(load_default=False)
+    limit = fields.Int(load_default=50, validate=validate.Range(min=1, max=MAX_PAGE_SIZE))
+
+class DueTasksQuerySchema(Schema):
+    # Интервал [from, to) по сроку; overdue - срок прошел, задача не выполнена
+    start = fields.DateTime(allow_none=True, data_key='from')
+    end = fields.DateTime(allow_none=True, data_key='to')
+    overdue = fields.Bool(load_default=False)
+    project_id = fields.Int(allow_none=True)
+    include_done = fields.Bool(load_default=False)
+    limit = fields.Int(allow_none=True, validate=validate.Range(min=1, max=MAX_PAGE_SIZE))
+    cursor = fields.Str(allow_none=True)
+
+class TaskTreeSchema(Schema):
+    project_id = fields.Int(allow_none=True)
+    depth = fields.Int(allow_none=True, validate=validate.Range(min=0, max=MAX_TREE_DEPTH))
+    rollups = fields.Bool(load_default=False)
 
 
 user_schema = UserSchema()
@@ -91,10 +171,20 @@ project_schema = ProjectSchema()
 projects_schema = ProjectSchema(many=True)
 task_schema = TaskSchema()
 tasks_schema = TaskSchema(many=True)
+task_updates_schema = TaskSchema(many=True, partial=True)
+task_batch_schema = TaskBatchSchema()
 comment_schema = CommentSchema()
 comments_schema = CommentSchema(many=True)
+comment_query_schema = CommentQuerySchema()
 login_schema = LoginSchema()
 registration_schema = RegistrationSchema()
 project_member_schema = ProjectMemberSchema()
+project_members_query_schema = ProjectMembersQuerySchema()
+user_directory_query_schema = UserDirectoryQuerySchema()
 task_assignee_schema = TaskAssigneeSchema()
 task_filter_schema = TaskFilterSchema()
+task_search_schema = TaskSearchSchema()
+task_tree_schema = TaskTreeSchema()
+due_tasks_query_schema = DueTasksQuerySchema()
+db_stats_query_schema = DbStatsQuerySchema()
+table_sample_schema = TableSampleSchema()
@@ -0,0 +1,146 @@
+import re
+from sqlalchemy import event, text, select, or_, false, func, literal, union_all, Integer, Float
+from models import db, Task, Comment
+
+# Полнотекстовый поиск по задачам и комментариям.
+# На SQLite - индексы FTS5 (external content) поверх таблиц task и comment, синхронизируются
+# триггерами, поэтому в индекс попадают и изменения через пакетные Core-запросы.
+# На остальных СУБД - запасной вариант через ILIKE
+
+TASK_TITLE_WEIGHT = 10.0
+TASK_DESCRIPTION_WEIGHT = 1.0
+# Совпадение только в комментарии ценится ниже совпадения в самой задаче
+COMMENT_RANK_FACTOR = 0.5
+
+TASK_FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS task_fts USING fts5(
+        title, description, content='task', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS task_fts_ai AFTER INSERT ON task BEGIN
+        INSERT INTO task_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS task_fts_ad AFTER DELETE ON task BEGIN
+        INSERT INTO task_fts(task_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS task_fts_au AFTER UPDATE OF title, description ON task BEGIN
+        INSERT INTO task_fts(task_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO task_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+]
+
+COMMENT_FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS comment_fts USING fts5(
+        text_comment, content='comment', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS comment_fts_ai AFTER INSERT ON comment BEGIN
+        INSERT INTO comment_fts(rowid, text_comment) VALUES (new.id, new.text_comment);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS comment_fts_ad AFTER DELETE ON comment BEGIN
+        INSERT INTO comment_fts(comment_fts, rowid, text_comment) VALUES ('delete', old.id, old.text_comment);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS comment_fts_au AFTER UPDATE OF text_comment ON comment BEGIN
+        INSERT INTO comment_fts(comment_fts, rowid, text_comment) VALUES ('delete', old.id, old.text_comment);
+        INSERT INTO comment_fts(rowid, text_comment) VALUES (new.id, new.text_comment);
+    END""",
+]
+
+def is_fts_available(bind):
+    return bind.dialect.name == 'sqlite'
+
+def _create_fts(connection, name, ddl):
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': name}
+    ).first()
+    for statement in ddl:
+        connection.execute(text(statement))
+    if not exists:
+        # Индекс создан поверх уже заполненной таблицы - заполняем его из содержимого
+        connection.execute(text(f"INSERT INTO {name}({name}) VALUES ('rebuild')"))
+
+def create_search_index(connection):
+    if not is_fts_available(connection):
+        return
+    _create_fts(connection, 'task_fts', TASK_FTS_DDL)
+    _create_fts(connection, 'comment_fts', COMMENT_FTS_DDL)
+
+def drop_search_index(connection, names=('task_fts', 'comment_fts')):
+    if not is_fts_available(connection):
+        return
+    for name in names:
+        # Триггеры висят на основных таблицах и без индекса ломали бы любую запись в них
+        for suffix in ('ai', 'ad', 'au'):
+            connection.execute(text(f'DROP TRIGGER IF EXISTS {name}_{suffix}'))
+        connection.execute(text(f'DROP TABLE IF EXISTS {name}'))
+
+# create_all/drop_all сами создают и удаляют индексы вместе с таблицами
+@event.listens_for(Task.__table__, 'after_create')
+def _task_created(target, connection, **kw):
+    if is_fts_available(connection):
+        _create_fts(connection, 'task_fts', TASK_FTS_DDL)
+
+@event.listens_for(Comment.__table__, 'after_create')
+def _comment_created(target, connection, **kw):
+    if is_fts_available(connection):
+        _create_fts(connection, 'comment_fts', COMMENT_FTS_DDL)
+
+@event.listens_for(Task.__table__, 'before_drop')
+def _task_dropped(target, connection, **kw):
+    drop_search_index(connection, ['task_fts'])
+
+@event.listens_for(Comment.__table__, 'before_drop')
+def _comment_dropped(target, connection, **kw):
+    drop_search_index(connection, ['comment_fts'])
+
+def tokenize(term):
+    return re.findall(r'\w+', term or '')
+
+def to_match_query(term):
+    # Каждое слово - в кавычках (спецсимволы FTS5 не интерпретируются) и с * для поиска по префиксу
+    return ' '.join(f'"{token}"*' for token in tokenize(term))
+
+def task_match_ids(term):
+    # Подзапрос с id задач, у которых совпал заголовок или описание
+    if not tokenize(term):
+        return select(Task.id).where(false())
+    if is_fts_available(db.session.get_bind()):
+        return text('SELECT rowid FROM task_fts WHERE task_fts MATCH :match').bindparams(
+            match=to_match_query(term)
+        ).columns(rowid=Integer)
+    pattern = f'%{term}%'
+    return select(Task.id).where(or_(Task.title.ilike(pattern), Task.description.ilike(pattern)))
+
+def task_hits(term, include_comments=False):
+    # Подзапрос (task_id, rank): чем меньше rank, тем релевантнее задача
+    if not tokenize(term):
+        return select(Task.id.label('task_id'), literal(0.0).label('rank')).where(false()).subquery('hits')
+    if is_fts_available(db.session.get_bind()):
+        sql = f"""
+            SELECT rowid AS task_id,
+                   bm25(task_fts, {TASK_TITLE_WEIGHT}, {TASK_DESCRIPTION_WEIGHT}) AS rank
+            FROM task_fts WHERE task_fts MATCH :match
+        """
+        if include_comments:
+            sql += f"""
+                UNION ALL
+                SELECT c.task_id, bm25(comment_fts) * {COMMENT_RANK_FACTOR} AS rank
+                FROM comment_fts JOIN comment c ON c.id = comment_fts.rowid
+                WHERE comment_fts MATCH :match
+            """
+            # Составной подзапрос SQLite не встраивает во внешний, так что bm25 вычисляется
+            # в контексте своего MATCH
+            sql = f'SELECT task_id, MIN(rank) AS rank FROM ({sql}) GROUP BY task_id'
+        return text(sql).bindparams(match=to_match_query(term)).columns(
+            task_id=Integer, rank=Float
+        ).subquery('hits')
+
+    pattern = f'%{term}%'
+    matches = select(Task.id.label('task_id'), literal(0.0).label('rank')).where(
+        or_(Task.title.ilike(pattern), Task.description.ilike(pattern))
+    )
+    if include_comments:
+        matches = union_all(matches, select(Comment.task_id.label('task_id'), literal(1.0).label('rank'))
+                            .where(Comment.text_comment.ilike(pattern)))
+    matches = matches.subquery()
+    return select(matches.c.task_id, func.min(matches.c.rank).label('rank')).group_by(
+        matches.c.task_id
+    ).subquery('hits')
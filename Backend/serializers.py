@@ -0,0 +1,98 @@
+from flask.json.provider import DefaultJSONProvider
+from marshmallow import fields
+from sqlalchemy import select
+from models import Task, Project, Comment
+from schemas import task_schema, project_schema, comment_schema
+
+try:
+    import orjson
+except ImportError:
+    # Без orjson провайдер работает через стандартный json
+    orjson = None
+
+# Быстрая сериализация списков. Вместо ORM-объектов и поля-за-полем marshmallow списочные
+# запросы выбирают нужные колонки через Core select(), а строки превращаются в словари
+# функцией, сгенерированной один раз по полям схемы. Форма ответа совпадает с dump схемы
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+# Как поле схемы приводится при выдаче; значения из БД уже нужного типа
+_CONVERTERS = {
+    fields.Integer: None,
+    fields.String: None,
+    fields.Boolean: None,
+    fields.DateTime: '_isoformat',
+}
+
+def _converter(field):
+    for field_class, converter in _CONVERTERS.items():
+        if type(field) is field_class:
+            return converter
+    raise TypeError(f'Поле {type(field).__name__} не поддерживается сериализатором строк')
+
+class RowSerializer:
+    # Колонки модели в порядке полей схемы и функция row -> dict, читающая строку по позициям.
+    # Лишние колонки в конце строки (например, rank) сериализатор не трогает
+    def __init__(self, schema, model):
+        self.keys = []
+        self.columns = []
+        items = []
+        for position, (name, field) in enumerate(schema.dump_fields.items()):
+            key = field.data_key or name
+            converter = _converter(field)
+            value = f'row[{position}]'
+            items.append(f'{key!r}: {converter}({value})' if converter else f'{key!r}: {value}')
+            self.keys.append(key)
+            self.columns.append(getattr(model, field.attribute or name))
+
+        source = 'def dump(row):\n    return {' + ', '.join(items) + '}\n'
+        namespace = {'_isoformat': _isoformat}
+        exec(compile(source, f'<{type(schema).__name__} row serializer>', 'exec'), namespace)
+        self.dump = namespace['dump']
+
+    def select(self, *extra):
+        return select(*self.columns, *extra)
+
+    def dump_many(self, rows):
+        return list(map(self.dump, rows))
+
+task_rows = RowSerializer(task_schema, Task)
+project_rows = RowSerializer(project_schema, Project)
+comment_rows = RowSerializer(comment_schema, Comment)
+
+class FastJSONProvider(DefaultJSONProvider):
+    # JSON через orjson, если он установлен. Типы, которых orjson не знает (даты и т.п.),
+    # обрабатываются так же, как в стандартном провайдере Flask
+    sort_keys = False
+    ensure_ascii = False
+
+    def _options(self, indent=False):
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._options()).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = orjson.dumps(obj, default=self.default, option=self._options(indent) | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+def init_app(app):
+    app.json_provider_class = FastJSONProvider
+    app.json = FastJSONProvider(app)
@@ -0,0 +1,175 @@
+from datetime import datetime, timedelta
+from sqlalchemy import event, text, select, insert, union_all, literal, func, case, cast, String, table, column
+from models import db, Task, TaskStatus, task_assigneess
+
+# Сводка по задачам проекта для дашборда.
+# На SQLite счетчики (проект, измерение, значение) -> количество задач лежат в таблице task_stats
+# и поддерживаются триггерами на task и task_assignees, поэтому их обновляют и пакетные
+# Core-запросы; чтение сводки - выборка нескольких десятков строк независимо от числа задач.
+# На остальных СУБД те же счетчики считаются группировкой по таблице задач.
+# Просроченные задачи зависят от текущего времени и всегда считаются запросом по индексу
+# (project_id, deadline_date)
+
+DIMENSIONS = ['status', 'priority', 'category']
+
+# Таблица создается DDL ниже (только на SQLite), в metadata моделей ее нет
+task_stats = table('task_stats', column('project_id'), column('dimension'), column('value'), column('count'))
+
+def _upsert(project, dimension, value, delta):
+    return f"""INSERT INTO task_stats(project_id, dimension, value, count) VALUES ({project}, '{dimension}', {value}, {delta})
+        ON CONFLICT(project_id, dimension, value) DO UPDATE SET count = count + {delta};"""
+
+def _task_counters(row, delta):
+    statements = [_upsert(f'{row}.project_id', 'total', "''", delta)]
+    statements += [_upsert(f'{row}.project_id', d, f'{row}.{d}', delta) for d in DIMENSIONS]
+    return '\n'.join(statements)
+
+def _assignee_counters(task_row, project, delta):
+    # Исполнители задачи task_row учитываются в проекте project
+    return f"""INSERT INTO task_stats(project_id, dimension, value, count)
+        SELECT {project}, 'assignee', CAST(user_id AS TEXT), {delta} FROM task_assignees WHERE task_id = {task_row}.id
+        ON CONFLICT(project_id, dimension, value) DO UPDATE SET count = count + {delta};"""
+
+STATS_DDL = [
+    """CREATE TABLE IF NOT EXISTS task_stats (
+        project_id INTEGER NOT NULL,
+        dimension VARCHAR(16) NOT NULL,
+        value VARCHAR(64) NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (project_id, dimension, value)
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS task_stats_ai AFTER INSERT ON task BEGIN
+        {_task_counters('new', 1)}
+    END""",
+    # Исполнители удаляемой задачи списываются здесь, если их строки удаляются после задачи,
+    # и в task_stats_assignee_ad, если до нее
+    f"""CREATE TRIGGER IF NOT EXISTS task_stats_ad AFTER DELETE ON task BEGIN
+        {_task_counters('old', -1)}
+        {_assignee_counters('old', 'old.project_id', -1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS task_stats_au AFTER UPDATE OF status, priority, category, project_id ON task BEGIN
+        {_task_counters('old', -1)}
+        {_task_counters('new', 1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS task_stats_au_project AFTER UPDATE OF project_id ON task
+        WHEN old.project_id != new.project_id BEGIN
+        {_assignee_counters('old', 'old.project_id', -1)}
+        {_assignee_counters('new', 'new.project_id', 1)}
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS task_stats_assignee_ai AFTER INSERT ON task_assignees BEGIN
+        INSERT INTO task_stats(project_id, dimension, value, count)
+            SELECT project_id, 'assignee', CAST(new.user_id AS TEXT), 1 FROM task WHERE id = new.task_id
+            ON CONFLICT(project_id, dimension, value) DO UPDATE SET count = count + 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS task_stats_assignee_ad AFTER DELETE ON task_assignees BEGIN
+        UPDATE task_stats SET count = count - 1
+        WHERE project_id = (SELECT project_id FROM task WHERE id = old.task_id)
+          AND dimension = 'assignee' AND value = CAST(old.user_id AS TEXT);
+    END""",
+]
+
+def is_rollup_available(bind):
+    return bind.dialect.name == 'sqlite'
+
+def grouped_counts(project_ids=None):
+    # (project_id, dimension, value, count) группировкой по задачам - заполнение task_stats
+    # и запасной вариант для СУБД без триггеров
+    def scoped(stmt):
+        return stmt.where(Task.project_id.in_(project_ids)) if project_ids is not None else stmt
+
+    queries = [scoped(select(Task.project_id, literal('total'), literal(''), func.count()).group_by(Task.project_id))]
+    for dimension in DIMENSIONS:
+        column = getattr(Task, dimension)
+        queries.append(scoped(
+            select(Task.project_id, literal(dimension), column, func.count()).group_by(Task.project_id, column)
+        ))
+    queries.append(scoped(
+        select(Task.project_id, literal('assignee'), cast(task_assigneess.c.user_id, String), func.count())
+        .join(task_assigneess, task_assigneess.c.task_id == Task.id)
+        .group_by(Task.project_id, task_assigneess.c.user_id)
+    ))
+    return union_all(*queries)
+
+def create_stats_rollup(connection):
+    if not is_rollup_available(connection):
+        return
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'task_stats'")
+    ).first()
+    for statement in STATS_DDL:
+        connection.execute(text(statement))
+    if not exists:
+        # Таблица создана поверх уже заполненной базы - считаем счетчики с нуля
+        connection.execute(insert(task_stats).from_select(
+            ['project_id', 'dimension', 'value', 'count'], grouped_counts()
+        ))
+
+STATS_TRIGGERS = ['task_stats_ai', 'task_stats_ad', 'task_stats_au', 'task_stats_au_project',
+                  'task_stats_assignee_ai', 'task_stats_assignee_ad']
+
+def drop_stats_rollup(connection):
+    if not is_rollup_available(connection):
+        return
+    for name in STATS_TRIGGERS:
+        connection.execute(text(f'DROP TRIGGER IF EXISTS {name}'))
+    connection.execute(text('DROP TABLE IF EXISTS task_stats'))
+
+# task_assignees создается после task - к этому моменту обе таблицы для триггеров на месте
+@event.listens_for(task_assigneess, 'after_create')
+def _assignees_created(target, connection, **kw):
+    create_stats_rollup(connection)
+
+@event.listens_for(Task.__table__, 'before_drop')
+def _task_dropped(target, connection, **kw):
+    drop_stats_rollup(connection)
+
+def _counters(project_id):
+    if is_rollup_available(db.session.get_bind()):
+        rows = db.session.execute(
+            select(task_stats.c.dimension, task_stats.c.value, task_stats.c.count)
+            .where(task_stats.c.project_id == project_id, task_stats.c.count > 0)
+        )
+    else:
+        counts = grouped_counts([project_id]).subquery()
+        rows = db.session.execute(select(*list(counts.c)[1:]))
+    return [tuple(row) for row in rows]
+
+def _deadline_counts(project_id, now):
+    # Незавершенные задачи с дедлайном в прошлом, в ближайшие сутки и в ближайшую неделю
+    day, week = now + timedelta(days=1), now + timedelta(days=7)
+    row = db.session.execute(
+        select(
+            func.coalesce(func.sum(case((Task.deadline_date < now, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((Task.deadline_date.between(now, day), 1), else_=0)), 0),
+            func.coalesce(func.sum(case((Task.deadline_date >= now, 1), else_=0)), 0),
+        ).where(
+            Task.project_id == project_id,
+            Task.deadline_date < week,
+            Task.status != TaskStatus.DONE.value
+        )
+    ).one()
+    return {'overdue': row[0], 'due_24h': row[1], 'due_7d': row[2]}
+
+def project_stats(project_id, choices):
+    # choices - допустимые значения каждого измерения; отсутствующие выводятся с нулем
+    now = datetime.now()
+    result = {'project_id': project_id, 'total': 0}
+    for dimension in DIMENSIONS:
+        result[f'by_{dimension}'] = dict.fromkeys(choices[dimension], 0)
+    assignees = {}
+
+    for dimension, value, count in _counters(project_id):
+        if dimension == 'total':
+            result['total'] = count
+        elif dimension == 'assignee':
+            assignees[int(value)] = count
+        else:
+            result[f'by_{dimension}'][value] = count
+
+    result['by_assignee'] = [
+        {'user_id': user_id, 'count': count}
+        for user_id, count in sorted(assignees.items(), key=lambda item: (-item[1], item[0]))
+    ]
+    result['deadlines'] = _deadline_counts(project_id, now)
+    result['generated_at'] = now.isoformat()
+    return result
@@ -0,0 +1,98 @@
+from sqlalchemy import select, literal
+from models import db, Task, TaskStatus
+
+# Ограничение глубины обхода - защита от циклов в parent_id
+MAX_TREE_DEPTH = 64
+
+def subtree_cte(roots, max_depth=MAX_TREE_DEPTH):
+    # roots - select с id корневых задач; результат - (id, depth) всех задач поддеревьев
+    tree = select(Task.id, literal(0).label('depth')).where(Task.id.in_(roots)).cte('subtree', recursive=True)
+    return tree.union_all(
+        select(Task.id, tree.c.depth + 1).where(Task.parent_id == tree.c.id, tree.c.depth < max_depth)
+    )
+
+def subtree_ids(task_ids):
+    # id задач вместе со всеми их подзадачами любой вложенности - один рекурсивный запрос
+    if not task_ids:
+        return set()
+    tree = subtree_cte(list(task_ids))
+    return set(db.session.scalars(select(tree.c.id)))
+
+def parent_map(task_ids, max_depth=MAX_TREE_DEPTH):
+    # parent_id задач и всех их предков - один рекурсивный запрос вверх по иерархии
+    if not task_ids:
+        return {}
+    chain = select(Task.id, Task.parent_id, literal(0).label('depth')).where(
+        Task.id.in_(list(task_ids))
+    ).cte('ancestors', recursive=True)
+    chain = chain.union_all(
+        select(Task.id, Task.parent_id, chain.c.depth + 1).where(Task.id == chain.c.parent_id, chain.c.depth < max_depth)
+    )
+    return dict(db.session.execute(select(chain.c.id, chain.c.parent_id)).all())
+
+def cyclic_moves(moves):
+    # moves - (id задачи, новый parent_id) в порядке применения. Результат - номера переносов,
+    # после которых задача оказалась бы внутри своего поддерева; остальные переносы учитываются
+    # при проверке следующих (два переноса пакета могут замкнуть цикл только вместе)
+    parents = parent_map({parent_id for task_id, parent_id in moves if parent_id is not None})
+    rejected = set()
+    for n, (task_id, parent_id) in enumerate(moves):
+        node, seen = parent_id, set()
+        while node is not None and node != task_id and node not in seen:
+            seen.add(node)
+            node = parents.get(node)
+        if node == task_id:
+            rejected.add(n)
+        else:
+            parents[task_id] = parent_id
+    return rejected
+
+def load_tree(roots, max_depth=MAX_TREE_DEPTH):
+    # Вся иерархия одним запросом: задачи поддеревьев в порядке создания
+    tree = subtree_cte(roots, max_depth)
+    return db.session.query(Task, tree.c.depth).join(tree, tree.c.id == Task.id).order_by(
+        Task.creation_date, Task.id
+    ).all()
+
+def build_tree(rows, dump, depth=None, rollups=False):
+    # Сборка дерева в памяти: rows - (задача, глубина), dump - сериализация одной задачи.
+    # Узлы глубже depth не выводятся, но учитываются в rollups.
+    # При цикле в parent_id задача приходит несколько раз с разной глубиной - берется минимальная,
+    # и потомком узла считается только задача ровно на уровень ниже
+    nodes = {}
+    for task, level in rows:
+        if task.id not in nodes or level < nodes[task.id][1]:
+            nodes[task.id] = (task, level)
+
+    children = {}
+    for task_id, (task, level) in nodes.items():
+        children.setdefault(task.parent_id, []).append(task_id)
+
+    roots = [task_id for task_id, (task, level) in nodes.items() if level == 0]
+
+    def visit(task_id):
+        task, level = nodes[task_id]
+        node = dump(task)
+        child_ids = [c for c in children.get(task_id, []) if c in nodes and nodes[c][1] == level + 1]
+        subtasks = [visit(c) for c in child_ids]
+
+        if rollups:
+            descendants = sum(1 + s['_descendants'] for s in subtasks)
+            done = sum((s['status'] == TaskStatus.DONE.value) + s['_done'] for s in subtasks)
+            node['subtask_count'] = len(subtasks)
+            node['descendant_count'] = descendants
+            node['done_count'] = done
+            node['done_ratio'] = round(done / descendants, 4) if descendants else None
+            node['_descendants'], node['_done'] = descendants, done
+
+        node['subtasks'] = subtasks if depth is None or level < depth else []
+        return node
+
+    def strip(node):
+        node.pop('_descendants', None)
+        node.pop('_done', None)
+        for child in node['subtasks']:
+            strip(child)
+        return node
+
+    return [strip(visit(task_id)) for task_id in roots]
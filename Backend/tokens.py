@@ -0,0 +1,118 @@
+import logging
+import os
+import threading
+import time
+from flask_jwt_extended import create_access_token, create_refresh_token
+from sqlalchemy import select, update
+from models import db, User
+from cache import TTLCache
+
+# Токены с утверждениями для авторизации: роль пользователя (role) и версия токенов (ver).
+# Отзыв всех токенов пользователя - увеличение User.token_version; токен принимается,
+# только если его ver совпадает с текущей версией.
+# Текущие (версия, роль) пользователей держатся в кэше процесса; фоновый поток раз в
+# TOKEN_STATE_REFRESH_SECONDS перечитывает их для всех закэшированных пользователей одним запросом,
+# поэтому проверка токена и обновление access-токена обращаются к БД только при первом запросе
+# пользователя в этом процессе (и после истечения TOKEN_STATE_CACHE_TTL).
+# Отзыв в другом воркере становится виден не позже чем через TOKEN_STATE_REFRESH_SECONDS
+
+logger = logging.getLogger(__name__)
+
+token_states = TTLCache(maxsize=0, ttl=0, name='token_states')
+
+_LOAD_CHUNK = 500
+
+class _Refresher:
+    def __init__(self):
+        self.app = None
+        self.interval = 0
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        # Поток запускается в процессе, который обслуживает запросы (после fork воркера gunicorn)
+        if self.interval <= 0 or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name='token-state-refresher', daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                with self.app.app_context():
+                    refresh_states()
+            except Exception:
+                logger.exception('Не удалось обновить состояние токенов')
+
+refresher = _Refresher()
+
+def init_app(app, jwt):
+    token_states.maxsize = app.config.get('TOKEN_STATE_CACHE_SIZE', 0)
+    token_states.ttl = app.config.get('TOKEN_STATE_CACHE_TTL', 0)
+    token_states.clear()
+    refresher.app = app
+    refresher.interval = app.config.get('TOKEN_STATE_REFRESH_SECONDS', 0) if token_states.enabled else 0
+    jwt.token_in_blocklist_loader(is_token_revoked)
+
+def _load_states(user_ids):
+    states = {}
+    for start in range(0, len(user_ids), _LOAD_CHUNK):
+        chunk = user_ids[start:start + _LOAD_CHUNK]
+        rows = db.session.execute(select(User.id, User.token_version, User.role).where(User.id.in_(chunk)))
+        states.update((user_id, (version, role)) for user_id, version, role in rows)
+    return states
+
+def refresh_states():
+    # Новые значения для всех закэшированных пользователей; удаленные пользователи выбывают
+    user_ids = token_states.keys()
+    states = _load_states(user_ids)
+    for user_id in user_ids:
+        if user_id in states:
+            token_states.replace(user_id, states[user_id])
+        else:
+            token_states.invalidate(user_id)
+
+def user_state(user_id):
+    # (версия токенов, роль) или None, если пользователя нет
+    refresher.ensure_started()
+    state = token_states.get(user_id)
+    if state is None:
+        state = _load_states([user_id]).get(user_id)
+        if state is not None:
+            token_states.set(user_id, state)
+    return state
+
+def is_token_revoked(jwt_header, jwt_payload):
+    state = user_state(int(jwt_payload['sub']))
+    return state is None or jwt_payload.get('ver', 0) != state[0]
+
+def _claims(state):
+    version, role = state
+    return {'ver': version, 'role': role}
+
+def issue_tokens(user):
+    state = (user.token_version or 0, user.role)
+    token_states.set(user.id, state)
+    return {
+        'access_token': create_access_token(identity=str(user.id), additional_claims=_claims(state)),
+        'refresh_token': create_refresh_token(identity=str(user.id), additional_claims=_claims(state)),
+    }
+
+def refresh_access_token(user_id):
+    # Вызывается после проверки refresh-токена - состояние пользователя уже в кэше
+    state = user_state(user_id)
+    if state is None:
+        return None
+    return create_access_token(identity=str(user_id), additional_claims=_claims(state))
+
+def revoke_tokens(user_id):
+    # Все выданные пользователю токены перестают приниматься после commit
+    db.session.execute(update(User).where(User.id == user_id).values(token_version=User.token_version + 1))
+
+def forget_user(user_id):
+    # После commit изменений версии или роли - следующий запрос прочитает их из БД
+    token_states.invalidate(user_id)
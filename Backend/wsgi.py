@@ -0,0 +1,4 @@
+from app import create_app
+
+# Точка входа для WSGI-сервера: gunicorn -c gunicorn.conf.py wsgi:app
+app = create_app()
@@ -4,7 +4,8 @@ import '../styles/projectmemberslist.css';
 
 function ProjectMembersList({ projectId, user, userProjectRole, permissions }) {
     const [members, setMembers] = useState([]);
-    const [allUsers, setAllUsers] = useState([]);
+    const [foundUsers, setFoundUsers] = useState([]);
+    const [userQuery, setUserQuery] = useState('');
     const [loading, setLoading] = useState(true);
     const [showAddModal, setShowAddModal] = useState(false);
     const [newMemberForm, setNewMemberForm] = useState({
@@ -21,9 +22,6 @@ function ProjectMembersList({ projectId, user, userProjectRole, permissions }) {
                 const members = membersResponse.data || [];
                 setMembers(members);
 
-                const usersResponse = await usersAPI.get_users();
-                setAllUsers(usersResponse.data || []);
-
             } catch (error) {
                 alert('Не удалось загрузить участников проекта');
             } finally {
@@ -36,9 +34,29 @@ function ProjectMembersList({ projectId, user, userProjectRole, permissions }) {
         }
     }, [projectId]);
 
+    // Кандидаты ищутся на сервере по мере ввода - весь справочник пользователей не загружается
+    useEffect(() => {
+        if (!showAddModal) {
+            return;
+        }
+        const timer = setTimeout(async () => {
+            try {
+                const params = { limit: 20, fields: 'id,username,email' };
+                if (userQuery.trim()) {
+                    params.q = userQuery.trim();
+                }
+                const response = await usersAPI.search_users(params);
+                setFoundUsers(response.data.items || []);
+            } catch (error) {
+                setFoundUsers([]);
+            }
+        }, 250);
+        return () => clearTimeout(timer);
+    }, [showAddModal, userQuery]);
+
     const getAvailableUsers = () => {
         const memberIds = members.map(member => member.user_id || member.id);
-        return allUsers.filter(userItem =>
+        return foundUsers.filter(userItem =>
             !memberIds.includes(userItem.id)
         );
     };
@@ -136,7 +154,6 @@ function ProjectMembersList({ projectId, user, userProjectRole, permissions }) {
                         <button
                             onClick={() => setShowAddModal(true)}
                             className="btn btn-primary"
-                            disabled={availableUsers.length === 0}
                         >
                             Добавить участника
                         </button>
@@ -223,14 +240,6 @@ function ProjectMembersList({ projectId, user, userProjectRole, permissions }) {
                 )}
             </div>
 
-            {permissions.canManageMembers && (
-                <div className="available-users-info">
-                    <p>
-                        <strong>Доступно для добавления:</strong> {availableUsers.length} пользователей
-                    </p>
-                </div>
-            )}
-
             {showAddModal && (
                 <div className="modal-overlay" onClick={() => setShowAddModal(false)}>
                     <div className="modal" onClick={(e) => e.stopPropagation()}>
@@ -247,6 +256,12 @@ function ProjectMembersList({ projectId, user, userProjectRole, permissions }) {
                         <form onSubmit={handleAddMember}>
                             <div className="form-group">
                                 <label>Выберите пользователя</label>
+                                <input
+                                    type="text"
+                                    value={userQuery}
+                                    onChange={(e) => setUserQuery(e.target.value)}
+                                    placeholder="Начало имени или email..."
+                                />
                                 <select
                                     value={newMemberForm.user_id}
                                     onChange={(e) => setNewMemberForm({...newMemberForm, user_id: e.target.value})}
@@ -2,8 +2,12 @@ import React, { useState, useEffect } from 'react';
 import { taskAPI, projectAPI } from '../services/api';
 import '../styles/tasklist.css';
 
+const TASK_PAGE_SIZE = 100;
+
 function TaskList({ projectId, user, userProjectRole, permissions }) {
     const [tasks, setTasks] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [loading, setLoading] = useState(true);
     const [projectMembers, setProjectMembers] = useState([]);
     const [showTaskModal, setShowTaskModal] = useState(false);
@@ -34,9 +38,11 @@ function TaskList({ projectId, user, userProjectRole, permissions }) {
                 const members = membersResponse.data || [];
                 setProjectMembers(members);
 
-                const taskParams = { project_id: projectId };
+                // Задачи загружаются страницами, следующая - по кнопке "Показать еще"
+                const taskParams = { project_id: projectId, limit: TASK_PAGE_SIZE };
                 const tasksResponse = await taskAPI.get_tasks(taskParams);
-                setTasks(tasksResponse.data || []);
+                setTasks(tasksResponse.data.items || []);
+                setNextCursor(tasksResponse.data.next_cursor);
 
             } catch (error) {
                 console.error('Ошибка загрузки данных:', error);
@@ -51,6 +57,21 @@ function TaskList({ projectId, user, userProjectRole, permissions }) {
         }
     }, [projectId]);
 
+    const loadMoreTasks = async () => {
+        try {
+            setLoadingMore(true);
+            const response = await taskAPI.get_tasks({ project_id: projectId, limit: TASK_PAGE_SIZE, cursor: nextCursor });
+            const loadedIds = new Set(tasks.map(t => t.id));
+            setTasks(prev => [...prev, ...response.data.items.filter(t => !loadedIds.has(t.id))]);
+            setNextCursor(response.data.next_cursor);
+        } catch (error) {
+            console.error('Ошибка загрузки задач:', error);
+            alert('Не удалось загрузить задачи');
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     const resetTaskForm = () => {
         setTaskForm({
             title: '',
@@ -238,7 +259,7 @@ function TaskList({ projectId, user, userProjectRole, permissions }) {
                     )}
 
                     <div className="tasks-count">
-                        Задач: {filteredTasks.length} из {tasks.length}
+                        Задач: {filteredTasks.length} из {tasks.length}{nextCursor ? '+' : ''}
                     </div>
                 </div>
 
@@ -386,6 +407,18 @@ function TaskList({ projectId, user, userProjectRole, permissions }) {
                 )}
             </div>
 
+            {nextCursor && (
+                <div className="tasks-load-more">
+                    <button
+                        onClick={loadMoreTasks}
+                        className="btn btn-secondary"
+                        disabled={loadingMore}
+                    >
+                        {loadingMore ? 'Загрузка...' : 'Показать еще'}
+                    </button>
+                </div>
+            )}
+
             {showTaskModal && (
                 <div className="modal-overlay" onClick={() => { setShowTaskModal(false); resetTaskForm(); }}>
                     <div className="modal modal-lg" onClick={(e) => e.stopPropagation()}>
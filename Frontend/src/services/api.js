@@ -125,7 +125,8 @@ export const systemAPI = {
     health: () => api.get('/health'),
     enums: () => api.get('/enums'),
     initTestDB: () => api.post('/init-db'),
-    dbStats: () => api.get('/db-stats')
+    dbStats: (params) => api.get('/db-stats', { params }),
+    dbTableSample: (table, params) => api.get(`/db-stats/tables/${table}`, { params })
 };
 
 export const authAPI = {
@@ -138,6 +139,8 @@ export const authAPI = {
 
 export const usersAPI = {
     get_users: () => api.get('/users'),
+    // Поиск по началу имени или email, постранично: { q, limit, cursor, fields, project_id }
+    search_users: (params = {}) => api.get('/users', { params }),
     get_user: (id) => api.get(`/users/${id}`)
 };
 
@@ -165,6 +168,8 @@ export const taskAPI = {
         return api.get('/tasks', { params: cleanParams });
     },
     get_task: (id) => api.get(`/tasks/${id}`),
+    // Задачи со сроком в интервале, постранично: { from, to, overdue, project_id, include_done, limit, cursor }
+    get_due_tasks: (params = {}) => api.get('/tasks/due', { params }),
     create_task: (taskData) => api.post('/tasks', taskData),
     update_task: (id, taskData) => api.put(`/tasks/${id}`, taskData),
     delete_task: (id) => api.delete(`/tasks/${id}`),